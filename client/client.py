@@ -1,40 +1,96 @@
 import requests
 import csv
+import os
+import time
 
-BASE_URL = "http://127.0.0.1:5000"
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_URL = os.environ.get("ODONTOCARE_URL", "http://127.0.0.1:5000")
+
+# Segundos: (conexión, lectura). La importación en bloque puede tardar más.
+TIMEOUT = (
+    float(os.environ.get("ODONTOCARE_TIMEOUT_CONEXION", 3.05)),
+    float(os.environ.get("ODONTOCARE_TIMEOUT_LECTURA", 30)),
+)
+TIMEOUT_IMPORTACION = (TIMEOUT[0], float(os.environ.get("ODONTOCARE_TIMEOUT_IMPORTACION", 600)))
+
+# -----------------------
+# Sesión HTTP compartida
+# -----------------------
+# Una sola requests.Session reutiliza las conexiones (keep-alive) entre
+# llamadas en lugar de abrir un TCP nuevo en cada una.
+#
+# Reintentos con backoff exponencial: los errores de conexión se reintentan
+# siempre (la petición no llegó a enviarse); los 502/503/504 y los cortes
+# de lectura solo en lecturas. PUT y DELETE no son idempotentes en esta API:
+# si el primer intento llegó, repetir PUT /citas/<id> responde 400 "La cita
+# ya está cancelada" y repetir un DELETE, 404.
+
+METODOS_REINTENTABLES = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def crear_sesion(pool=10, reintentos=3, backoff=0.5):
+    reintento = Retry(
+        total=reintentos,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=METODOS_REINTENTABLES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=reintento)
+
+    sesion = requests.Session()
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+sesion = crear_sesion(
+    pool=int(os.environ.get("ODONTOCARE_POOL", 10)),
+    reintentos=int(os.environ.get("ODONTOCARE_REINTENTOS", 3)),
+)
 
 # -----------------------
 # Helpers HTTP
 # -----------------------
+def cabeceras(token=None):
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
 def post(url, data, token=None):
-    headers = {"Content-Type": "application/json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    return requests.post(url, json=data, headers=headers)
+    return sesion.post(url, json=data, headers=cabeceras(token), timeout=TIMEOUT)
+
+def get(url, token=None, params=None):
+    return sesion.get(url, params=params, headers=cabeceras(token), timeout=TIMEOUT)
 
-def get(url, token=None):
-    headers = {}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    return requests.get(url, headers=headers)
+def put(url, data=None, token=None):
+    return sesion.put(url, json=data, headers=cabeceras(token), timeout=TIMEOUT)
 
 # -----------------------
 # Auth
 # -----------------------
-def login():
-    print("\nLOGIN")
-    username = input("Usuario: ")
-    password = input("Password: ")
-
+def iniciar_sesion(username, password):
+    """Login sin interacción: devuelve el access_token."""
     r = post(f"{BASE_URL}/auth/login", {
         "username": username,
         "password": password
     })
-    
+
     r.raise_for_status()
-    print("Login correcto\n")
     return r.json()["access_token"]
 
+def login():
+    print("\nLOGIN")
+    username = input("Usuario: ")
+    password = input("Password: ")
+
+    token = iniciar_sesion(username, password)
+    print("Login correcto\n")
+    return token
+
 # -----------------------
 # Formularios
 # -----------------------
@@ -66,7 +122,6 @@ def crear_paciente(token):
     print("Paciente creado:", r.json()["paciente"], "\n")
     
 def crear_centro(token):
-  def crear_centro(token):
     print("\nCREAR CENTRO")
     nombre = input("Nombre: ")
     direccion = input("Dirección: ")
@@ -117,50 +172,6 @@ def crear_doctor(token):
     print("Doctor creado:", r.json()["doctor"], "\n")
 
 
-def crear_cita(token):
-   def crear_cita(token):
-    print("\nCREAR CITA")
-
-    try:
-        paciente_id = int(input("ID del paciente: "))
-        doctor_id = int(input("ID del doctor: "))
-        centro_id = int(input("ID del centro: "))
-        fecha = input("Fecha (YYYY-MM-DDTHH:MM:SS): ")
-        motivo = input("Motivo: ")
-
-        r = post(f"{BASE_URL}/citas", {
-            "paciente_id": paciente_id,
-            "doctor_id": doctor_id,
-            "centro_id": centro_id,
-            "fecha": fecha,
-            "motivo": motivo
-        }, token)
-
-        if r.status_code == 400:
-            print("Error de validación:", r.json().get("error"))
-            return
-
-        if r.status_code == 403:
-            print("No tienes permisos para crear citas.")
-            return
-
-        if r.status_code == 404:
-            print("Paciente, doctor o centro no existe.")
-            return
-
-        if r.status_code == 409:
-            print("El doctor ya tiene una cita en esa fecha.")
-            return
-
-        r.raise_for_status()
-
-        print("Cita creada correctamente:")
-        print(r.json()["cita"], "\n")
-
-    except ValueError:
-        print("Error: los IDs deben ser numéricos.\n")
-
-    
 def listar_citas(token):
     print("\nLISTAR CITAS")
     print("Filtros opcionales (deja vacío si no aplica)")
@@ -182,14 +193,26 @@ def listar_citas(token):
     if fecha:
         params["fecha"] = fecha
 
-    headers = {"Authorization": f"Bearer {token}"}
-    r = requests.get(f"{BASE_URL}/citas", params=params, headers=headers)
-
-    r.raise_for_status()
-    for c in r.json():
+    for c in iterar_citas(token, **params):
         print(c)
 
 
+def iterar_citas(token, **filtros):
+    """Recorre todas las citas visibles siguiendo next_cursor página a página."""
+    params = dict(filtros)
+
+    while True:
+        r = get(f"{BASE_URL}/citas/", token, params)
+
+        r.raise_for_status()
+        datos = r.json()
+        yield from datos["items"]
+
+        if not datos["next_cursor"]:
+            break
+        params["cursor"] = datos["next_cursor"]
+
+
 # -----------------------
 # Menú
 # -----------------------
@@ -201,7 +224,8 @@ def menu():
 3. Crear doctor
 4. Crear cita
 5. Listar citas
-6. Cargar datos desde CSV
+6. Cargar datos desde CSV (concurrente, reanudable)
+7. Importar CSV en bloque (una sola petición)
 0. Salir
 ==============================
 """)
@@ -225,59 +249,228 @@ def main():
             listar_citas(token)
         elif opcion == "6":
             cargar_datos_csv(token)
+        elif opcion == "7":
+            importar_csv(token)
         elif opcion == "0":
             print("Saliendo...")
             break
         else:
             print("Opción no válida\n")
             
-def cargar_datos_csv(token, ruta_csv="../data/datos.csv"):
+# -----------------------
+# Carga concurrente desde CSV
+# -----------------------
+# Las filas se agrupan por tipo. Los centros van primero y en orden de
+# fichero: el centro_id de los doctores se refiere al id que recibe cada
+# centro al crearse, así que no se pueden crear en paralelo. Después
+# pacientes y doctores se envían a la vez desde un pool de hilos acotado.
+#
+# Cada fila terminada (creada, ya existente o rechazada por datos inválidos)
+# se apunta en un fichero de progreso; si la carga se interrumpe, al volver
+# a lanzarla se saltan esas filas. Las que fallan por red o 5xx se reintentan
+# con backoff y, si siguen fallando, quedan pendientes para la siguiente vez.
+
+REINTENTOS_FILA = 3
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class CargaInterrumpida(Exception):
+    pass
+
+
+def cuerpo_fila(fila):
+    tipo = fila["tipo"]
+
+    if tipo == "centro":
+        return "/admin/centros", {
+            "nombre": fila["nombre"],
+            "direccion": fila["direccion"]
+        }
+
+    if tipo == "paciente":
+        return "/admin/pacientes", {
+            "nombre": fila["nombre"],
+            "telefono": fila["telefono"],
+            "estado": fila["estado"] or "ACTIVO",
+            "username": fila["username"],
+            "password": fila["password"]
+        }
+
+    if tipo == "doctor":
+        return "/admin/doctores", {
+            "nombre": fila["nombre"],
+            "especialidad": fila["especialidad"],
+            "centro_id": int(fila["centro_id"]),
+            "username": fila["username"],
+            "password": fila["password"]
+        }
+
+    raise ValueError(f"Tipo desconocido: {tipo}")
+
+
+def enviar_fila(sesion_http, token, fila, reintentos=REINTENTOS_FILA, backoff=0.5):
+    """Devuelve "creada", "existe", "invalida" o "fallida"."""
+    try:
+        ruta, datos = cuerpo_fila(fila)
+    except (KeyError, ValueError):
+        return "invalida"
+
+    for intento in range(reintentos + 1):
+        if intento:
+            time.sleep(backoff * 2 ** (intento - 1))
+
+        try:
+            r = sesion_http.post(
+                f"{BASE_URL}{ruta}", json=datos, headers=cabeceras(token), timeout=TIMEOUT
+            )
+        except requests.RequestException:
+            continue
+
+        # Un POST repetido cuyo primer intento sí llegó devuelve 409: ya está creada
+        if r.status_code in (200, 201):
+            return "creada"
+        if r.status_code == 409:
+            return "existe"
+        # 422: token mal formado o con firma inválida (flask-jwt-extended)
+        if r.status_code in (401, 403, 422):
+            raise CargaInterrumpida(f"HTTP {r.status_code}: vuelve a iniciar sesión como admin")
+        if r.status_code not in ESTADOS_REINTENTABLES:
+            return "invalida"
+
+    return "fallida"
+
+
+def barra_progreso(hechas, total, contadores, ancho=30):
+    llenas = ancho * hechas // max(total, 1)
+    resumen = " ".join(f"{k}={v}" for k, v in contadores.items())
+    print(f"\r[{'#' * llenas}{'.' * (ancho - llenas)}] {hechas}/{total} {resumen}", end="", flush=True)
+
+
+def cargar_datos_csv(token, ruta_csv="../data/datos.csv", hilos=8, ruta_progreso=None):
     print("\nCargando datos desde CSV...\n")
 
+    ruta_progreso = ruta_progreso or ruta_csv + ".progreso"
+    hechas_antes = set()
+    if os.path.exists(ruta_progreso):
+        with open(ruta_progreso, encoding="utf-8") as f:
+            hechas_antes = {int(linea) for linea in f if linea.strip()}
+        print(f"Reanudando: {len(hechas_antes)} filas ya cargadas en {ruta_progreso}")
+
+    # Número de fila del fichero (la cabecera es la 1) -> fila
+    grupos = {"centro": [], "persona": []}
     with open(ruta_csv, newline="", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for fila in reader:
-            tipo = fila["tipo"]
-
-            try:
-                if tipo == "centro":
-                    r = post(f"{BASE_URL}/admin/centros", {
-                        "nombre": fila["nombre"],
-                        "direccion": fila["direccion"]
-                    }, token)
-
-                elif tipo == "paciente":
-                    r = post(f"{BASE_URL}/admin/pacientes", {
-                        "nombre": fila["nombre"],
-                        "telefono": fila["telefono"],
-                        "estado": fila["estado"],
-                        "username": fila["username"],
-                        "password": fila["password"]
-                    }, token)
-
-                elif tipo == "doctor":
-                    r = post(f"{BASE_URL}/admin/doctores", {
-                        "nombre": fila["nombre"],
-                        "especialidad": fila["especialidad"],
-                        "centro_id": int(fila["centro_id"]),
-                        "username": fila["username"],
-                        "password": fila["password"]
-                    }, token)
-
-                else:
-                    print(f"Tipo desconocido: {tipo}")
-                    continue
-
-                if r.status_code in (200, 201):
-                    print(f"OK → {tipo}: {fila['nombre']}")
-                elif r.status_code == 409:
-                    print(f"YA EXISTE → {tipo}: {fila['nombre']}")
-                else:
-                    print(f"ERROR ({r.status_code}) → {tipo}: {fila['nombre']}")
-
-            except Exception as e:
-                print(f"Excepción procesando fila {fila}: {e}")
+        for numero, fila in enumerate(csv.DictReader(csvfile), start=2):
+            if numero not in hechas_antes:
+                grupos["centro" if fila["tipo"] == "centro" else "persona"].append((numero, fila))
+
+    total = len(grupos["centro"]) + len(grupos["persona"])
+    contadores = {"creada": 0, "existe": 0, "invalida": 0, "fallida": 0}
+    errores = []
+    hechas = 0
+
+    sesion_carga = crear_sesion(pool=hilos)
+
+    with open(ruta_progreso, "a", encoding="utf-8") as progreso:
+
+        def anotar(numero, fila, resultado):
+            nonlocal hechas
+            hechas += 1
+            contadores[resultado] += 1
+            if resultado in ("invalida", "fallida"):
+                errores.append((numero, resultado, fila["tipo"], fila["nombre"]))
+            if resultado != "fallida":
+                progreso.write(f"{numero}\n")
+                progreso.flush()
+            barra_progreso(hechas, total, contadores)
+
+        try:
+            # 1) Centros, en orden y de uno en uno
+            for numero, fila in grupos["centro"]:
+                anotar(numero, fila, enviar_fila(sesion_carga, token, fila))
+
+            # Sin todos los centros los doctores fallarían con 404 y se darían por hechos
+            if contadores["fallida"]:
+                raise CargaInterrumpida("no se pudieron crear todos los centros")
+
+            # 2) Pacientes y doctores en paralelo, como mucho hilos * 4 en vuelo
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                en_vuelo = {}
+                try:
+                    for numero, fila in grupos["persona"]:
+                        if len(en_vuelo) >= hilos * 4:
+                            terminadas, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                            for futuro in terminadas:
+                                anotar(*en_vuelo.pop(futuro), futuro.result())
+                        futuro = pool.submit(enviar_fila, sesion_carga, token, fila)
+                        en_vuelo[futuro] = (numero, fila)
+
+                    for futuro in as_completed(list(en_vuelo)):
+                        anotar(*en_vuelo.pop(futuro), futuro.result())
+                finally:
+                    for futuro in en_vuelo:
+                        futuro.cancel()
+
+        except CargaInterrumpida as e:
+            print(f"\nCarga detenida ({e}). Se reanudará desde {ruta_progreso}.\n")
+            return contadores
+        finally:
+            sesion_carga.close()
+
+    print()
+    for numero, resultado, tipo, nombre in errores:
+        estado = "INVÁLIDA" if resultado == "invalida" else "PENDIENTE"
+        print(f"  {estado} fila {numero} → {tipo}: {nombre}")
+
+    if contadores["fallida"]:
+        print(f"{contadores['fallida']} filas pendientes: vuelve a lanzar la carga para reintentarlas.\n")
+    else:
+        os.remove(ruta_progreso)
+        print("Carga completa.\n")
+
+    return contadores
+
+def importar_csv(token, ruta_csv="../data/datos.csv", bloque=64 * 1024):
+    # Sube el fichero entero a /admin/import en una sola petición (streaming),
+    # el servidor valida e inserta por lotes y devuelve los errores por fila
+    print("\nImportando CSV en bloque...\n")
+
+    total = os.path.getsize(ruta_csv)
+
+    def leer_con_progreso():
+        enviados = 0
+        with open(ruta_csv, "rb") as f:
+            while True:
+                datos = f.read(bloque)
+                if not datos:
+                    break
+                enviados += len(datos)
+                print(f"\rEnviado {enviados * 100 // max(total, 1)}% ({enviados}/{total} bytes)", end="", flush=True)
+                yield datos
+        print()
+
+    r = sesion.post(
+        f"{BASE_URL}/admin/import",
+        data=leer_con_progreso(),
+        headers={"Content-Type": "text/csv", **cabeceras(token)},
+        timeout=TIMEOUT_IMPORTACION
+    )
+
+    if r.status_code == 403:
+        print("No tienes permisos para importar datos (solo admin).\n")
+        return
+
+    r.raise_for_status()
+    resultado = r.json()
+
+    print(f"Filas procesadas: {resultado['procesadas']}")
+    for tipo, n in resultado["creadas"].items():
+        print(f"  {tipo}: {n} creados")
+    for error in resultado["errores"]:
+        print(f"  ERROR fila {error['fila']}: {error['error']}")
+    if resultado["total_errores"] > len(resultado["errores"]):
+        print(f"  ... {resultado['total_errores'] - len(resultado['errores'])} errores más")
+    print()
+
 
 def crear_cita(token):
     print("\nCREAR CITA")
@@ -287,13 +480,15 @@ def crear_cita(token):
         doctor_id = int(input("ID del doctor: "))
         centro_id = int(input("ID del centro: "))
         fecha = input("Fecha (YYYY-MM-DDTHH:MM:SS): ")
+        duracion = int(input("Duración en minutos [30]: ") or 30)
         motivo = input("Motivo: ")
 
-        r = post(f"{BASE_URL}/citas", {
+        r = post(f"{BASE_URL}/citas/", {
             "paciente_id": paciente_id,
             "doctor_id": doctor_id,
             "centro_id": centro_id,
             "fecha": fecha,
+            "duracion": duracion,
             "motivo": motivo
         }, token)
 
@@ -311,7 +506,7 @@ def crear_cita(token):
             return
 
         if r.status_code == 409:
-            print("El doctor ya tiene una cita en esa fecha y hora.\n")
+            print("El doctor ya tiene una cita que se solapa con ese horario.\n")
             return
 
         r.raise_for_status()
@@ -320,7 +515,7 @@ def crear_cita(token):
         print(r.json()["cita"], "\n")
 
     except ValueError:
-        print("Error: los IDs deben ser numéricos.\n")
+        print("Error: los IDs y la duración deben ser numéricos.\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+
+import aiohttp
+
+BASE_URL = os.environ.get("ODONTOCARE_URL", "http://127.0.0.1:5000")
+
+
+# -----------------------
+# Cliente asíncrono
+# -----------------------
+# Mismas operaciones que client.py pero sin input(): pensado para scripts
+# que lanzan miles de peticiones a la vez.
+#
+#   async with ClienteAsync(concurrencia=200) as api:
+#       await api.login("admin", "1234")
+#       await asyncio.gather(*(api.crear_centro(f"C{i}", "Calle") for i in range(100)))
+#       async for cita in api.listar_citas(estado="PENDIENTE"):
+#           ...
+#
+# - Un único aiohttp.ClientSession con pool de conexiones keep-alive.
+# - concurrencia limita las peticiones en vuelo (semáforo).
+# - El token se renueva solo: antes de que caduque y si la API responde 401
+#   (caducado o revocado) se vuelve a hacer login con las mismas credenciales.
+
+# Solo lecturas: PUT /citas/<id> (cancelar) y DELETE no son idempotentes aquí,
+# un reintento tras un primer intento que sí llegó respondería 400 o 404
+METODOS_REINTENTABLES = {"GET", "HEAD"}
+
+
+class ErrorAPI(Exception):
+
+    def __init__(self, status, mensaje):
+        super().__init__(f"HTTP {status}: {mensaje}")
+        self.status = status
+        self.mensaje = mensaje
+
+
+def caducidad_token(token):
+    """exp del JWT (sin verificar la firma) o None."""
+    try:
+        carga = token.split(".")[1]
+        carga += "=" * (-len(carga) % 4)
+        return json.loads(base64.urlsafe_b64decode(carga)).get("exp")
+    except (IndexError, ValueError):
+        return None
+
+
+class ClienteAsync:
+
+    def __init__(self, base_url=BASE_URL, concurrencia=100, conexiones=100,
+                 timeout=30, reintentos=3, backoff=0.5, margen_renovacion=30):
+        self.base_url = base_url.rstrip("/")
+        self.concurrencia = concurrencia
+        self.conexiones = conexiones
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.margen_renovacion = margen_renovacion
+
+        self.token = None
+        self._credenciales = None
+        self._caduca = None
+        self._sesion = None
+        self._semaforo = asyncio.Semaphore(concurrencia)
+        self._lock_login = asyncio.Lock()
+
+    async def __aenter__(self):
+        self._sesion = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.conexiones),
+            timeout=self.timeout
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+    async def cerrar(self):
+        if self._sesion:
+            await self._sesion.close()
+            self._sesion = None
+
+    # -----------------------
+    # Auth
+    # -----------------------
+    async def login(self, username, password):
+        self._credenciales = (username, password)
+        # Siempre hace login: con otras credenciales el token actual no sirve
+        await self._renovar(None, forzar=True)
+        return self.token
+
+    async def _renovar(self, token_usado, forzar=False):
+        # Si varias peticiones reciben 401 a la vez solo una repite el login
+        async with self._lock_login:
+            if not forzar and self.token is not None and self.token != token_usado:
+                return
+
+            username, password = self._credenciales
+            datos = await self._enviar("POST", "/auth/login", {
+                "username": username,
+                "password": password
+            }, autenticar=False)
+
+            self.token = datos["access_token"]
+            self._caduca = caducidad_token(self.token)
+
+    async def _token_vigente(self):
+        if self._credenciales and self._caduca and time.time() > self._caduca - self.margen_renovacion:
+            await self._renovar(self.token)
+        return self.token
+
+    # -----------------------
+    # Petición con reintentos
+    # -----------------------
+    async def _enviar(self, metodo, ruta, datos=None, params=None, autenticar=True):
+        renovado = False
+        intento = 0
+
+        while True:
+            token = await self._token_vigente() if autenticar else None
+            cabeceras = {"Authorization": f"Bearer {token}"} if token else {}
+
+            try:
+                async with self._semaforo:
+                    async with self._sesion.request(
+                        metodo, self.base_url + ruta, json=datos, params=params, headers=cabeceras
+                    ) as r:
+                        status = r.status
+                        try:
+                            cuerpo = await r.json(content_type=None)
+                        except ValueError:
+                            cuerpo = None  # cuerpo vacío o página de error HTML
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Los POST solo se repiten si ni siquiera se pudo conectar
+                reintentable = metodo in METODOS_REINTENTABLES or isinstance(e, aiohttp.ClientConnectorError)
+                if intento >= self.reintentos or not reintentable:
+                    raise
+            else:
+                if status == 401 and autenticar and self._credenciales and not renovado:
+                    await self._renovar(token)
+                    renovado = True
+                    continue
+
+                if status in (502, 503, 504) and metodo in METODOS_REINTENTABLES and intento < self.reintentos:
+                    pass
+                elif status >= 400:
+                    mensaje = (cuerpo or {}).get("error") or (cuerpo or {}).get("msg")
+                    raise ErrorAPI(status, mensaje)
+                else:
+                    return cuerpo
+
+            await asyncio.sleep(self.backoff * 2 ** intento)
+            intento += 1
+
+    # -----------------------
+    # Operaciones
+    # -----------------------
+    async def crear_paciente(self, nombre, username, password, telefono=None, estado="ACTIVO"):
+        datos = await self._enviar("POST", "/admin/pacientes", {
+            "nombre": nombre,
+            "telefono": telefono,
+            "estado": estado,
+            "username": username,
+            "password": password
+        })
+        return datos["paciente"]
+
+    async def crear_centro(self, nombre, direccion):
+        datos = await self._enviar("POST", "/admin/centros", {
+            "nombre": nombre,
+            "direccion": direccion
+        })
+        return datos["centro"]
+
+    async def crear_doctor(self, nombre, especialidad, centro_id, username, password):
+        datos = await self._enviar("POST", "/admin/doctores", {
+            "nombre": nombre,
+            "especialidad": especialidad,
+            "centro_id": centro_id,
+            "username": username,
+            "password": password
+        })
+        return datos["doctor"]
+
+    async def crear_cita(self, doctor_id, centro_id, fecha, motivo=None, paciente_id=None, duracion=None):
+        cita = {
+            "paciente_id": paciente_id,
+            "doctor_id": doctor_id,
+            "centro_id": centro_id,
+            "fecha": fecha,
+            "motivo": motivo
+        }
+        if duracion is not None:
+            cita["duracion"] = duracion
+
+        datos = await self._enviar("POST", "/citas/", cita)
+        return datos["cita"]
+
+    async def cancelar_cita(self, cita_id):
+        datos = await self._enviar("PUT", f"/citas/{cita_id}")
+        return datos["cita"]
+
+    async def listar_citas(self, limite=None, **filtros):
+        """Itera todas las citas visibles. La página siguiente se pide mientras
+        se consume la actual."""
+        params = {k: v for k, v in filtros.items() if v is not None}
+        if limite:
+            params["limit"] = limite
+
+        siguiente = asyncio.ensure_future(self._enviar("GET", "/citas/", params=dict(params)))
+        try:
+            while siguiente:
+                datos = await siguiente
+                siguiente = None
+
+                if datos["next_cursor"]:
+                    params["cursor"] = datos["next_cursor"]
+                    siguiente = asyncio.ensure_future(self._enviar("GET", "/citas/", params=dict(params)))
+
+                for cita in datos["items"]:
+                    yield cita
+        finally:
+            if siguiente:
+                siguiente.cancel()
+
+    async def exportar_citas(self, **filtros):
+        """Itera las citas según llegan del export NDJSON, sin paginar."""
+        params = {k: v for k, v in filtros.items() if v is not None}
+        params["format"] = "ndjson"
+        token = await self._token_vigente()
+
+        async with self._sesion.get(
+            self.base_url + "/citas/",
+            params=params,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout.total)
+        ) as r:
+            if r.status >= 400:
+                raise ErrorAPI(r.status, await r.text())
+
+            async for linea in r.content:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+# -----------------------
+# Generador de carga
+# -----------------------
+# python client_async.py --usuario admin --password 1234 --pacientes 1000 --concurrencia 50
+
+async def generar_carga(args):
+    async with ClienteAsync(concurrencia=args.concurrencia, conexiones=args.concurrencia) as api:
+        await api.login(args.usuario, args.password)
+        sufijo = int(time.time())
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(
+            api.crear_paciente(f"Paciente {i}", f"carga{sufijo}_{i}", "1234")
+            for i in range(args.pacientes)
+        ), return_exceptions=True)
+        duracion = time.perf_counter() - inicio
+
+        errores = [r for r in resultados if isinstance(r, Exception)]
+        print(f"{args.pacientes} pacientes en {duracion:.2f} s "
+              f"({args.pacientes / duracion:.1f} peticiones/s), {len(errores)} errores")
+
+        inicio = time.perf_counter()
+        n = 0
+        async for _ in api.listar_citas(limite=500):
+            n += 1
+        print(f"{n} citas listadas en {time.perf_counter() - inicio:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de carga con el cliente asíncrono")
+    parser.add_argument("--usuario", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--pacientes", type=int, default=100)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    asyncio.run(generar_carga(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
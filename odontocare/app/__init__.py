@@ -1,14 +1,23 @@
 from flask import Flask
-from .extensions import db, jwt
+from .extensions import db, jwt, cache_usuarios, cache_catalogo, cache_reportes, instrumentacion, consultas_lentas
+from .utils.base_datos import configurar_base_datos
+from .utils.serializacion import ProveedorJSON
 from config import Config
 
-def create_app():
+def create_app(config_class=Config):
    
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+    app.json = ProveedorJSON(app)
 
     db.init_app(app)
+    configurar_base_datos(app)
     jwt.init_app(app)
+    cache_usuarios.init_app(app)
+    cache_catalogo.init_app(app)
+    cache_reportes.init_app(app)
+    instrumentacion.init_app(app)
+    consultas_lentas.init_app(app)
     
     #Para testar el funcionamiento de la API
     @app.route("/")
@@ -31,4 +40,11 @@ def create_app():
     app.register_blueprint(admin_bp, url_prefix="/admin")
     app.register_blueprint(citas_bp, url_prefix="/citas")
 
+    # flask --app run init-db: crea tablas y aplica migraciones sin arrancar el servidor
+    @app.cli.command("init-db")
+    def init_db():
+        from .migraciones import aplicar_migraciones
+        aplicar_migraciones()
+        print("Base de datos lista")
+
     return app
\ No newline at end of file
@@ -0,0 +1,231 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models import User, Paciente, Centro, Doctor
+from app.utils.security import invalidar_usuarios
+from app.utils.passwords import hashear_lote
+from app.utils.versiones import marcar_cambios
+
+
+# ======================
+# Importación masiva (POST /admin/import)
+# ======================
+# El cuerpo (CSV con las columnas de data/datos.csv o NDJSON con las mismas
+# claves) se lee en streaming y se procesa por lotes: cada lote se valida con
+# unas pocas consultas IN, se inserta con executemany y se confirma en su
+# propia transacción. Los errores se devuelven por número de fila.
+
+CAMPOS_OBLIGATORIOS = {
+    "centro": ["nombre", "direccion"],
+    "paciente": ["nombre", "username", "password"],
+    "doctor": ["nombre", "especialidad", "centro_id", "username", "password"],
+}
+
+# Campos que deben llegar como texto (en NDJSON pueden venir con otro tipo)
+CAMPOS_TEXTO = ["nombre", "direccion", "especialidad", "username", "password", "telefono", "estado"]
+
+
+def leer_filas(stream, formato):
+    """Genera (numero_fila, dict) desde el cuerpo de la petición."""
+    texto = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+    if formato == "csv":
+        for numero, fila in enumerate(csv.DictReader(texto), start=1):
+            yield numero, fila
+    else:
+        for numero, linea in enumerate(texto, start=1):
+            if linea.strip():
+                try:
+                    fila = json.loads(linea)
+                except ValueError:
+                    fila = None
+                yield numero, fila if isinstance(fila, dict) else {"tipo": None, "_invalida": True}
+
+
+class Importacion:
+
+    def __init__(self):
+        self.procesadas = 0
+        self.creadas = {"centro": 0, "paciente": 0, "doctor": 0}
+        self.errores = []
+        self.total_errores = 0
+
+    def error(self, numero, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < current_app.config["IMPORTACION_MAX_ERRORES"]:
+            self.errores.append({"fila": numero, "error": mensaje})
+
+    def resultado(self):
+        return {
+            "procesadas": self.procesadas,
+            "creadas": self.creadas,
+            "total_errores": self.total_errores,
+            "errores": sorted(self.errores, key=lambda e: e["fila"])
+        }
+
+    # ----------------------
+    # Validación de un lote
+    # ----------------------
+
+    def validar(self, lote):
+        validas = []
+
+        for numero, fila in lote:
+            if fila.get("_invalida"):
+                self.error(numero, "Línea JSON inválida")
+                continue
+
+            tipo = fila.get("tipo")
+            tipo = tipo.strip() if isinstance(tipo, str) else tipo
+            if not isinstance(tipo, str) or tipo not in CAMPOS_OBLIGATORIOS:
+                self.error(numero, f"Tipo desconocido: {tipo if tipo is not None else ''}")
+                continue
+
+            no_texto = [c for c in CAMPOS_TEXTO if fila.get(c) is not None and not isinstance(fila[c], str)]
+            if no_texto:
+                self.error(numero, "Deben ser texto: " + ", ".join(no_texto))
+                continue
+
+            fila = {k: (v.strip() if isinstance(v, str) else v) for k, v in fila.items()}
+            faltan = [c for c in CAMPOS_OBLIGATORIOS[tipo] if not fila.get(c)]
+            if faltan:
+                self.error(numero, "Faltan campos obligatorios: " + ", ".join(faltan))
+                continue
+
+            if tipo == "doctor":
+                try:
+                    if isinstance(fila["centro_id"], bool):
+                        raise TypeError
+                    fila["centro_id"] = int(fila["centro_id"])
+                except (TypeError, ValueError):
+                    self.error(numero, "centro_id debe ser numérico")
+                    continue
+
+            validas.append((numero, tipo, fila))
+
+        return validas
+
+    def descartar_duplicados(self, filas, campo, existentes, mensaje):
+        vistos = set(existentes)
+        resultado = []
+
+        for numero, tipo, fila in filas:
+            if fila[campo] in vistos:
+                self.error(numero, mensaje)
+                continue
+            vistos.add(fila[campo])
+            resultado.append((numero, tipo, fila))
+
+        return resultado
+
+    # ----------------------
+    # Inserción de un lote
+    # ----------------------
+
+    def procesar_lote(self, lote):
+        self.procesadas += len(lote)
+        filas = self.validar(lote)
+
+        centros = [f for f in filas if f[1] == "centro"]
+        personas = [f for f in filas if f[1] != "centro"]
+
+        # Centros primero: los doctores del mismo lote pueden depender de ellos
+        nombres = [f["nombre"] for _, _, f in centros]
+        existentes = {n for (n,) in db.session.query(Centro.nombre).filter(Centro.nombre.in_(nombres))}
+        centros = self.descartar_duplicados(centros, "nombre", existentes, "El centro ya existe")
+
+        if centros:
+            db.session.execute(insert(Centro), [
+                {"nombre": f["nombre"], "direccion": f["direccion"]} for _, _, f in centros
+            ])
+            marcar_cambios("centros")
+
+        # Usuarios únicos y centros existentes
+        usernames = [f["username"] for _, _, f in personas]
+        existentes = {u for (u,) in db.session.query(User.username).filter(User.username.in_(usernames))}
+        personas = self.descartar_duplicados(personas, "username", existentes, "El usuario ya existe")
+
+        ids_centro = {f["centro_id"] for _, tipo, f in personas if tipo == "doctor"}
+        validos = {c for (c,) in db.session.query(Centro.id).filter(Centro.id.in_(ids_centro))}
+        aceptadas = []
+        for numero, tipo, fila in personas:
+            if tipo == "doctor" and fila["centro_id"] not in validos:
+                self.error(numero, "El centro no existe")
+            else:
+                aceptadas.append((numero, tipo, fila))
+
+        if aceptadas:
+            self.insertar_personas(aceptadas)
+
+        db.session.commit()
+
+        self.creadas["centro"] += len(centros)
+        for _, tipo, _ in aceptadas:
+            self.creadas[tipo] += 1
+
+    def insertar_personas(self, filas):
+        hashes = hashear_lote([f["password"] for _, _, f in filas])
+        roles = {"paciente": "paciente", "doctor": "medico"}
+
+        usuarios = db.session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [
+                {"username": f["username"], "password_hash": h, "rol": roles[tipo]}
+                for (_, tipo, f), h in zip(filas, hashes)
+            ]
+        ).scalars().all()
+        invalidar_usuarios(*usuarios)
+
+        pacientes, doctores = [], []
+        for (_, tipo, f), user_id in zip(filas, usuarios):
+            if tipo == "paciente":
+                pacientes.append({
+                    "nombre": f["nombre"],
+                    "telefono": f.get("telefono") or None,
+                    "estado": f.get("estado") or "ACTIVO",
+                    "id_usuario": user_id
+                })
+            else:
+                doctores.append({
+                    "nombre": f["nombre"],
+                    "especialidad": f["especialidad"],
+                    "centro_id": f["centro_id"],
+                    "id_usuario": user_id
+                })
+
+        if pacientes:
+            db.session.execute(insert(Paciente), pacientes)
+            marcar_cambios("pacientes")
+        if doctores:
+            db.session.execute(insert(Doctor), doctores)
+            marcar_cambios("doctores")
+
+
+def importar(stream, formato):
+    """Resumen de la importación. Si el cuerpo no es UTF-8 lleva además "error":
+    los lotes anteriores ya están confirmados y el resto no se procesa."""
+    importacion = Importacion()
+    filas = leer_filas(stream, formato)
+    tamano = current_app.config["IMPORTACION_LOTE"]
+
+    while True:
+        try:
+            lote = list(islice(filas, tamano))
+        except UnicodeDecodeError:
+            resultado = importacion.resultado()
+            resultado["error"] = (
+                f"El cuerpo no es UTF-8 válido (después de la fila {importacion.procesadas}); "
+                "se han importado los lotes anteriores"
+            )
+            return resultado
+        if not lote:
+            break
+        importacion.procesar_lote(lote)
+
+    return importacion.resultado()
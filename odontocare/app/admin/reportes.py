@@ -0,0 +1,269 @@
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from flask import current_app, request
+from sqlalchemy import case, func
+
+from app.extensions import db, cache_reportes
+from app.models import Doctor, ResumenCitas, ResumenCitasMes
+from app.citas.disponibilidad import plantillas_horario
+from app.citas.resumen import semana_de, mes_de
+from app.utils.validacion import parsear_id
+from app.utils.versiones import leer_versiones
+
+
+# ======================
+# Informes (GET /admin/reportes/...)
+# ======================
+# Se calculan sobre los resúmenes de citas/resumen.py, que ya tienen las
+# citas contadas por centro, doctor y estado: por día (resumen_citas) y por
+# mes (resumen_citas_mes). Los informes por mes o totales leen los meses
+# completos del rango del resumen mensual y solo los días sueltos de los
+# extremos del diario, así que 5 años son unos miles de filas en lugar de
+# cientos de miles de citas.
+#
+# El resultado se guarda en cache_reportes con clave (informe, parámetros,
+# versiones de las tablas que lee). Cualquier escritura en esas tablas cambia
+# la versión, así que nunca se sirve un informe con datos viejos; el TTL solo
+# limita la memoria de las claves que ya no se van a pedir.
+
+PERIODOS = ("dia", "semana", "mes", "total")
+AGRUPACIONES = {"centro": "centro_id", "doctor": "doctor_id", "estado": "estado"}
+INICIO_PERIODO = {
+    "dia": lambda d: d,
+    "semana": semana_de,
+    "mes": mes_de,
+    "total": lambda d: None,
+}
+
+
+def _fecha(nombre):
+    texto = request.args.get(nombre)
+    if not texto:
+        return None
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f"{nombre} debe tener el formato AAAA-MM-DD")
+
+
+def leer_parametros(periodo_defecto, agrupaciones=(), fechas_obligatorias=False):
+    """Filtros comunes de la query string. Lanza ValueError si alguno no es válido.
+    desde y hasta son días incluidos en el informe."""
+    desde, hasta = _fecha("desde"), _fecha("hasta")
+    if fechas_obligatorias and not (desde and hasta):
+        raise ValueError("desde y hasta son obligatorios (AAAA-MM-DD)")
+    if desde and hasta and desde > hasta:
+        raise ValueError("desde no puede ser posterior a hasta")
+    # La ocupación recorre el rango día a día
+    dias_maximo = current_app.config["REPORTES_DIAS_MAXIMO"]
+    if desde and hasta and (hasta - desde).days + 1 > dias_maximo:
+        raise ValueError(f"el rango desde-hasta admite como máximo {dias_maximo} días")
+
+    periodo = request.args.get("periodo", periodo_defecto)
+    if periodo not in PERIODOS:
+        raise ValueError(f"periodo debe ser uno de: {', '.join(PERIODOS)}")
+
+    por = [p for p in request.args.get("por", "").split(",") if p]
+    invalidas = [p for p in por if p not in agrupaciones]
+    if invalidas:
+        raise ValueError(f"por admite: {', '.join(agrupaciones) or 'ninguna agrupación'}")
+
+    centro_id = request.args.get("centro_id")
+    doctor_id = request.args.get("doctor_id")
+
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "periodo": periodo,
+        # Orden fijo: "doctor,estado" y "estado,doctor" son el mismo informe
+        "por": tuple(p for p in agrupaciones if p in por),
+        "centro_id": parsear_id(centro_id, "centro_id") if centro_id else None,
+        "doctor_id": parsear_id(doctor_id, "doctor_id") if doctor_id else None,
+    }
+
+
+def cacheado(nombre, parametros, tablas, calcular):
+    """Resultado de calcular(parametros), reutilizado mientras no cambien las tablas."""
+    versiones = leer_versiones(tablas)
+    clave = (
+        nombre,
+        tuple(sorted(parametros.items())),
+        tuple(versiones.get(t, (0, None))[0] for t in tablas),
+    )
+    return cache_reportes.obtener(clave, lambda _: calcular(parametros))
+
+
+def _mes_siguiente(dia):
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _tramos(p):
+    """[(modelo, columna de fecha, inicio, fin)] que cubren el rango; fin excluido."""
+    desde = p["desde"]
+    fin = p["hasta"] + timedelta(days=1) if p["hasta"] else None
+    if p["periodo"] in ("dia", "semana"):
+        return [(ResumenCitas, ResumenCitas.dia, desde, fin)]
+
+    # Meses completos: del primer día de mes >= desde al primer día de mes <= hasta
+    primer_mes = desde if not desde or desde.day == 1 else _mes_siguiente(desde)
+    ultimo_mes = mes_de(fin) if fin else None
+    if primer_mes and ultimo_mes and primer_mes >= ultimo_mes:
+        return [(ResumenCitas, ResumenCitas.dia, desde, fin)]
+
+    tramos = [(ResumenCitasMes, ResumenCitasMes.mes, primer_mes, ultimo_mes)]
+    if desde and desde < primer_mes:
+        tramos.append((ResumenCitas, ResumenCitas.dia, desde, primer_mes))
+    if fin and ultimo_mes < fin:
+        tramos.append((ResumenCitas, ResumenCitas.dia, ultimo_mes, fin))
+    return tramos
+
+
+def _agrupado(p, columnas, metricas):
+    """Filas (periodo, *columnas, *metricas) ordenadas, con las métricas (sumas)
+    acumuladas sobre todos los tramos. metricas(modelo) da sus expresiones."""
+    acumulado = {}
+    for modelo, fecha, inicio, fin in _tramos(p):
+        grupos = [getattr(modelo, c) for c in columnas]
+        if p["periodo"] != "total":
+            grupos.insert(0, getattr(modelo, p["periodo"]))
+
+        # Al cancelar, el estado anterior puede quedar a cero: se ignora igual
+        # que si no existiera (reconstruir_resumen no crea esas filas)
+        query = db.session.query(*grupos, *metricas(modelo)).filter(modelo.citas != 0)
+        if inicio:
+            query = query.filter(fecha >= inicio)
+        if fin:
+            query = query.filter(fecha < fin)
+        if p["centro_id"]:
+            query = query.filter(modelo.centro_id == p["centro_id"])
+        if p["doctor_id"]:
+            query = query.filter(modelo.doctor_id == p["doctor_id"])
+
+        n = len(grupos)
+        for fila in query.group_by(*grupos):
+            clave = tuple(fila[:n]) if p["periodo"] != "total" else (None, *fila[:n])
+            valores = [int(v or 0) for v in fila[n:]]
+            previos = acumulado.get(clave)
+            acumulado[clave] = [a + b for a, b in zip(previos, valores)] if previos else valores
+
+    return [(*clave, *valores) for clave, valores in sorted(acumulado.items())]
+
+
+def _texto(dia):
+    return dia.isoformat() if dia else None
+
+
+def _cabecera(p):
+    return {
+        "desde": _texto(p["desde"]),
+        "hasta": _texto(p["hasta"]),
+        "periodo": p["periodo"],
+    }
+
+
+# ----------------------
+# Citas por periodo
+# ----------------------
+
+def informe_citas(p):
+    columnas = [AGRUPACIONES[a] for a in p["por"]]
+    metricas = lambda m: [func.sum(m.citas), func.sum(m.minutos)]
+
+    items = []
+    for periodo, *valores, citas, minutos in _agrupado(p, columnas, metricas):
+        item = {"periodo": _texto(periodo)}
+        item.update(zip(columnas, valores))
+        item.update({"citas": citas, "minutos": minutos})
+        items.append(item)
+
+    return dict(_cabecera(p), por=list(p["por"]), items=items)
+
+
+# ----------------------
+# Cancelaciones por centro
+# ----------------------
+
+def informe_cancelaciones(p):
+    metricas = lambda m: [
+        func.sum(m.citas),
+        func.sum(case((m.estado == "CANCELADA", m.citas), else_=0)),
+    ]
+
+    items = []
+    for periodo, centro_id, total, cancel in _agrupado(p, ["centro_id"], metricas):
+        items.append({
+            "periodo": _texto(periodo),
+            "centro_id": centro_id,
+            "citas": total,
+            "canceladas": cancel,
+            "tasa_cancelacion": round(cancel / total, 4) if total else None,
+        })
+
+    return dict(_cabecera(p), items=items)
+
+
+# ----------------------
+# Ocupación por doctor
+# ----------------------
+# Minutos reservados (citas no canceladas) frente a minutos de consulta según
+# la plantilla semanal de cada doctor (o HORARIO_POR_DEFECTO). Se usa la
+# plantilla actual para todo el rango: no hay histórico de horarios.
+
+def _minutos(tramos):
+    return sum(
+        (fin.hour * 60 + fin.minute) - (inicio.hour * 60 + inicio.minute)
+        for inicio, fin in tramos
+    )
+
+
+def _dias_semana(p):
+    """{inicio_periodo: Counter {dia_semana: número de días}} del rango."""
+    inicio_de = INICIO_PERIODO[p["periodo"]]
+    dias = defaultdict(Counter)
+    dia = p["desde"]
+    while dia <= p["hasta"]:
+        dias[inicio_de(dia)][dia.weekday()] += 1
+        dia += timedelta(days=1)
+    return dias
+
+
+def informe_ocupacion(p):
+    doctores = db.session.query(Doctor.id, Doctor.centro_id).order_by(Doctor.id)
+    if p["centro_id"]:
+        doctores = doctores.filter(Doctor.centro_id == p["centro_id"])
+    if p["doctor_id"]:
+        doctores = doctores.filter(Doctor.id == p["doctor_id"])
+    doctores = doctores.all()
+
+    # Minutos de consulta de cada doctor por día de la semana
+    jornada = {
+        doctor_id: {dia: _minutos(tramos) for dia, tramos in plantilla.items()}
+        for doctor_id, plantilla in plantillas_horario([d.id for d in doctores]).items()
+    }
+
+    metricas = lambda m: [
+        func.sum(case((m.estado != "CANCELADA", m.citas), else_=0)),
+        func.sum(case((m.estado != "CANCELADA", m.minutos), else_=0)),
+    ]
+    reservados = {
+        (periodo, doctor_id): (citas, minutos)
+        for periodo, doctor_id, citas, minutos in _agrupado(p, ["doctor_id"], metricas)
+    }
+
+    items = []
+    for periodo, dias in _dias_semana(p).items():
+        for doctor_id, centro_id in doctores:
+            disponibles = sum(n * jornada[doctor_id].get(dia, 0) for dia, n in dias.items())
+            citas, minutos = reservados.get((periodo, doctor_id), (0, 0))
+            items.append({
+                "periodo": _texto(periodo),
+                "doctor_id": doctor_id,
+                "centro_id": centro_id,
+                "citas": citas,
+                "minutos_reservados": minutos,
+                "minutos_disponibles": disponibles,
+                "ocupacion": round(minutos / disponibles, 4) if disponibles else None,
+            })
+
+    return dict(_cabecera(p), items=items)
@@ -1,12 +1,22 @@
-from werkzeug.security import generate_password_hash
-from app.utils.security import admin_required
+from app.utils.security import admin_required, revocar_tokens, invalidar_usuarios
+from app.utils.passwords import hashear_password
+from app.utils.validacion import parsear_id
 from app.models import User
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 
-from app.extensions import db
-from app.models import Paciente, Centro, Doctor
+from app.extensions import db, cache_usuarios, cache_catalogo, cache_reportes, consultas_lentas
+from app.models import Paciente, Centro, Doctor, Horario
+from datetime import time
+from app.utils.paginacion import leer_parametros_pagina, paginar, pagina
+from app.utils.exportacion import formato_exportacion, respuesta_exportacion
+from app.admin.importacion import importar
+from app.admin import reportes
+from app.citas.agenda import paciente_renombrado
+from app.utils import catalogo
+from app.utils.versiones import marcar_cambios, condicional
+from app.utils.serializacion import ESQUEMA_PACIENTE, ESQUEMA_DOCTOR, ESQUEMA_CENTRO
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -20,6 +30,91 @@ def ping():
     return jsonify({"message": "Admin protegido funcionando"})
 
 
+# ----------------------
+# Estadísticas de caches
+# ----------------------
+
+@admin_bp.route("/cache", methods=["GET"])
+@admin_required
+def estadisticas_cache():
+    return jsonify({
+        "usuarios": cache_usuarios.estadisticas(),
+        "catalogo": cache_catalogo.estadisticas(),
+        "reportes": cache_reportes.estadisticas()
+    }), 200
+
+
+# ----------------------
+# Consultas lentas
+# ----------------------
+# Sentencias que superaron CONSULTAS_LENTAS_UMBRAL_MS, agrupadas por huella y
+# ordenadas por tiempo total. DELETE vacía el registro (p. ej. tras un cambio
+# de índices, para medir de nuevo).
+
+@admin_bp.route("/consultas-lentas", methods=["GET"])
+@admin_required
+def listar_consultas_lentas():
+    return jsonify({
+        "umbral_ms": consultas_lentas.umbral,
+        "items": consultas_lentas.resumen()
+    }), 200
+
+
+@admin_bp.route("/consultas-lentas", methods=["DELETE"])
+@admin_required
+def vaciar_consultas_lentas():
+    consultas_lentas.limpiar()
+    return jsonify({"message": "Registro de consultas lentas vaciado"}), 200
+
+
+# ======================
+# INFORMES
+# ======================
+# Filtros comunes: desde y hasta (AAAA-MM-DD, incluidos), periodo
+# (dia | semana | mes | total), centro_id y doctor_id. Ver admin/reportes.py.
+
+@admin_bp.route("/reportes/citas", methods=["GET"])
+@admin_required
+@condicional("citas")
+def reporte_citas():
+    # por=centro,doctor,estado (cualquier combinación) añade columnas al agrupado
+    try:
+        parametros = reportes.leer_parametros("dia", agrupaciones=("centro", "doctor", "estado"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(reportes.cacheado("citas", parametros, ("citas",), reportes.informe_citas)), 200
+
+
+@admin_bp.route("/reportes/cancelaciones", methods=["GET"])
+@admin_required
+@condicional("citas")
+def reporte_cancelaciones():
+    try:
+        parametros = reportes.leer_parametros("total")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        reportes.cacheado("cancelaciones", parametros, ("citas",), reportes.informe_cancelaciones)
+    ), 200
+
+
+@admin_bp.route("/reportes/ocupacion", methods=["GET"])
+@admin_required
+@condicional("citas", "doctores", "horarios")
+def reporte_ocupacion():
+    # desde y hasta obligatorios: los minutos disponibles dependen del rango
+    try:
+        parametros = reportes.leer_parametros("total", fechas_obligatorias=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(reportes.cacheado(
+        "ocupacion", parametros, ("citas", "doctores", "horarios"), reportes.informe_ocupacion
+    )), 200
+
+
 # ======================
 # CRUD PACIENTES
 # ======================
@@ -50,7 +145,7 @@ def crear_paciente():
     # Crear usuario paciente
     user = User(
         username=username,
-        password_hash=generate_password_hash(password),
+        password_hash=hashear_password(password),
         rol="paciente"
     )
 
@@ -65,6 +160,8 @@ def crear_paciente():
     )
 
     db.session.add(paciente)
+    invalidar_usuarios(user.id)
+    marcar_cambios("pacientes")
     db.session.commit()
 
     return jsonify({
@@ -84,36 +181,47 @@ def crear_paciente():
 
 @admin_bp.route("/pacientes", methods=["GET"])
 @jwt_required()
+@condicional("pacientes")
 def listar_pacientes():
-    pacientes = Paciente.query.all()
-
-    return jsonify([
-        {
-            "id": p.id,
-            "nombre": p.nombre,
-            "telefono": p.telefono,
-            "estado": p.estado,
-            "id_usuario": p.id_usuario
-        }
-        for p in pacientes
-    ]), 200
+    # Solo las columnas serializadas, sin instanciar objetos Paciente
+    columnas = db.session.query(
+        Paciente.id,
+        Paciente.nombre,
+        Paciente.telefono,
+        Paciente.estado,
+        Paciente.id_usuario
+    )
+
+    try:
+        limite, cursor = leer_parametros_pagina()
+        formato = formato_exportacion()
+        if formato:
+            return respuesta_exportacion(
+                columnas.order_by(Paciente.id),
+                formato, ESQUEMA_PACIENTE, "pacientes"
+            )
+        query = paginar(columnas, [Paciente.id], limite, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    pacientes, next_cursor = pagina(query.all(), limite, ["id"])
+
+    return jsonify({
+        "items": ESQUEMA_PACIENTE.filas(pacientes),
+        "next_cursor": next_cursor
+    }), 200
 
 
 @admin_bp.route("/pacientes/<int:paciente_id>", methods=["GET"])
 @admin_required
+@condicional("pacientes")
 def obtener_paciente(paciente_id):
     paciente = Paciente.query.get(paciente_id)
 
     if not paciente:
         return jsonify({"error": "Paciente no encontrado"}), 404
 
-    return jsonify({
-        "id": paciente.id,
-        "nombre": paciente.nombre,
-        "telefono": paciente.telefono,
-        "estado": paciente.estado,
-        "id_usuario": paciente.id_usuario
-    }), 200
+    return jsonify(ESQUEMA_PACIENTE.fila(paciente)), 200
 
 
 @admin_bp.route("/pacientes/<int:paciente_id>", methods=["PUT"])
@@ -126,11 +234,36 @@ def actualizar_paciente(paciente_id):
 
     data = request.get_json()
 
+    if not data:
+        return jsonify({"error": "Datos JSON requeridos"}), 400
+
+    # Con foreign_keys=ON un id_usuario inexistente fallaría al confirmar
+    if data.get("id_usuario") is not None:
+        try:
+            data["id_usuario"] = parsear_id(data["id_usuario"], "id_usuario")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if not User.query.get(data["id_usuario"]):
+            return jsonify({"error": "El usuario no existe"}), 404
+
+    usuario_anterior = paciente.id_usuario
+    nombre_anterior = paciente.nombre
+
     paciente.nombre = data.get("nombre", paciente.nombre)
     paciente.telefono = data.get("telefono", paciente.telefono)
     paciente.estado = data.get("estado", paciente.estado)
     paciente.id_usuario = data.get("id_usuario", paciente.id_usuario)
 
+    # Cambia el paciente asociado a los usuarios: sus tokens quedan obsoletos
+    if paciente.id_usuario != usuario_anterior:
+        revocar_tokens(usuario_anterior, paciente.id_usuario)
+
+    # El nombre está copiado en las agendas de sus días con citas
+    if paciente.nombre != nombre_anterior:
+        paciente_renombrado(paciente.id)
+
+    marcar_cambios("pacientes")
     db.session.commit()
 
     return jsonify({"message": "Paciente actualizado correctamente"}), 200
@@ -144,7 +277,9 @@ def eliminar_paciente(paciente_id):
     if not paciente:
         return jsonify({"error": "Paciente no encontrado"}), 404
 
+    revocar_tokens(paciente.id_usuario)
     db.session.delete(paciente)
+    marcar_cambios("pacientes")
     db.session.commit()
 
     return jsonify({"message": "Paciente eliminado correctamente"}), 200
@@ -174,6 +309,9 @@ def crear_centro():
 
     centro = Centro(nombre=nombre, direccion=direccion)
     db.session.add(centro)
+    db.session.flush()
+    catalogo.invalidar_centros(centro.id)
+    marcar_cambios("centros")
     db.session.commit()
 
     return jsonify({
@@ -187,16 +325,12 @@ def crear_centro():
 @admin_bp.route("/centros/<int:centro_id>", methods=["GET"])
 @jwt_required()
 def obtener_centro(centro_id):
-    centro = Centro.query.get(centro_id)
+    centro = catalogo.obtener_centro(centro_id)
 
     if not centro:
         return jsonify({"error": "Centro no encontrado"}), 404
 
-    return jsonify({
-        "id": centro.id,
-        "nombre": centro.nombre,
-        "direccion": centro.direccion
-    }), 200
+    return jsonify(ESQUEMA_CENTRO.fila(centro)), 200
 
 
 # ======================
@@ -223,16 +357,21 @@ def crear_doctor():
             "error": "nombre, especialidad, centro_id, username y password son obligatorios"
         }), 400
 
+    try:
+        centro_id = parsear_id(centro_id, "centro_id")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     if User.query.filter_by(username=username).first():
         return jsonify({"error": "El usuario ya existe"}), 409
 
-    centro = Centro.query.get(centro_id)
+    centro = catalogo.obtener_centro(centro_id)
     if not centro:
         return jsonify({"error": "El centro no existe"}), 404
 
     user = User(
         username=username,
-        password_hash=generate_password_hash(password),
+        password_hash=hashear_password(password),
         rol="medico"
     )
 
@@ -247,14 +386,16 @@ def crear_doctor():
     )
 
     db.session.add(doctor)
+    db.session.flush()
+    invalidar_usuarios(user.id)
+    catalogo.invalidar_doctores(doctor.id)
+    marcar_cambios("doctores")
     db.session.commit()
 
     return jsonify({
         "message": "Doctor creado correctamente",
         "doctor": {
-            "id": doctor.id,
-            "nombre": doctor.nombre,
-            "especialidad": doctor.especialidad,
+            **ESQUEMA_DOCTOR.fila(doctor),
             "centro": {
                 "id": centro.id,
                 "nombre": centro.nombre
@@ -268,6 +409,104 @@ def crear_doctor():
     }), 201
 
 
+# ----------------------
+# Horario semanal del doctor
+# ----------------------
+
+def serializar_horario(h):
+    return {
+        "dia_semana": h.dia_semana,
+        "inicio": h.hora_inicio.strftime("%H:%M"),
+        "fin": h.hora_fin.strftime("%H:%M")
+    }
+
+
+@admin_bp.route("/doctores/<int:doctor_id>/horario", methods=["GET"])
+@jwt_required()
+def obtener_horario(doctor_id):
+    if not catalogo.obtener_doctor(doctor_id):
+        return jsonify({"error": "Doctor no encontrado"}), 404
+
+    horarios = (
+        Horario.query.filter_by(doctor_id=doctor_id)
+        .order_by(Horario.dia_semana, Horario.hora_inicio)
+        .all()
+    )
+
+    return jsonify([serializar_horario(h) for h in horarios]), 200
+
+
+@admin_bp.route("/doctores/<int:doctor_id>/horario", methods=["PUT"])
+@admin_required
+def actualizar_horario(doctor_id):
+    if not catalogo.obtener_doctor(doctor_id):
+        return jsonify({"error": "Doctor no encontrado"}), 404
+
+    data = request.get_json()
+
+    if not isinstance(data, list):
+        return jsonify({
+            "error": "Se espera una lista de tramos {dia_semana, inicio, fin}"
+        }), 400
+
+    horarios = []
+    for tramo in data:
+        try:
+            dia = int(tramo["dia_semana"])
+            inicio = time.fromisoformat(tramo["inicio"])
+            fin = time.fromisoformat(tramo["fin"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({
+                "error": "Cada tramo necesita dia_semana (0-6), inicio y fin (HH:MM)"
+            }), 400
+
+        if not 0 <= dia <= 6 or inicio >= fin:
+            return jsonify({"error": "Tramo de horario inválido"}), 400
+
+        horarios.append(Horario(
+            doctor_id=doctor_id,
+            dia_semana=dia,
+            hora_inicio=inicio,
+            hora_fin=fin
+        ))
+
+    # La plantilla se sustituye entera
+    Horario.query.filter_by(doctor_id=doctor_id).delete()
+    db.session.add_all(horarios)
+    marcar_cambios("horarios")
+    db.session.commit()
+
+    return jsonify({
+        "message": "Horario actualizado correctamente",
+        "horario": [serializar_horario(h) for h in horarios]
+    }), 200
+
+
+# ======================
+# IMPORTACIÓN MASIVA
+# ======================
+
+@admin_bp.route("/import", methods=["POST"])
+@admin_required
+def importar_datos():
+    tipo = request.mimetype
+
+    if tipo in ("text/csv", "application/csv"):
+        formato = "csv"
+    elif tipo in ("application/x-ndjson", "application/jsonlines"):
+        formato = "ndjson"
+    else:
+        return jsonify({
+            "error": "Content-Type debe ser text/csv o application/x-ndjson"
+        }), 415
+
+    resultado = importar(request.stream, formato)
+    if "error" in resultado:
+        return jsonify(resultado), 400
+
+    return jsonify(resultado), 200
+
+
 # ======================
 # CRUD ROLES
 # ======================
@@ -299,11 +538,13 @@ def crear_usuario():
 
     user = User(
         username=username,
-        password_hash=generate_password_hash(password),
+        password_hash=hashear_password(password),
         rol=rol
     )
 
     db.session.add(user)
+    db.session.flush()
+    invalidar_usuarios(user.id)
     db.session.commit()
 
     return jsonify({
@@ -1,13 +1,13 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import (
     create_access_token,
-    verify_jwt_in_request,
-    get_jwt_identity
+    verify_jwt_in_request
 )
 
 from app.extensions import db
 from app.models import User
+from app.utils.security import claims_usuario, identidad_actual, invalidar_usuarios
+from app.utils.passwords import hashear_password, verificar_password
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -45,21 +45,21 @@ def register():
     else:
         # A partir del segundo usuario, exigir admin
         verify_jwt_in_request()
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
 
-        if not user or user.rol != "admin":
+        if identidad_actual().rol != "admin":
             return jsonify({
                 "error": "Acceso solo para administradores"
             }), 403
 
     user = User(
         username=username,
-        password_hash=generate_password_hash(password),
+        password_hash=hashear_password(password),
         rol=rol
     )
 
     db.session.add(user)
+    db.session.flush()
+    invalidar_usuarios(user.id)
     db.session.commit()
 
     return jsonify({
@@ -92,10 +92,18 @@ def login():
 
     user = User.query.filter_by(username=username).first()
 
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not verificar_password(user, password):
         return jsonify({"error": "Credenciales inválidas"}), 401
 
-    access_token = create_access_token(identity=str(user.id))
+    # verificar_password puede haber actualizado el hash a PASSWORD_HASH_METODO
+    if db.session.is_modified(user):
+        db.session.commit()
+
+    # Rol, paciente/doctor y versión viajan en el token (ver utils/security.py)
+    access_token = create_access_token(
+        identity=str(user.id),
+        additional_claims=claims_usuario(user)
+    )
 
     return jsonify({
         "access_token": access_token,
@@ -0,0 +1,178 @@
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import AgendaDia, Cita, Paciente
+from app.citas.reservas import bloquear_doctor
+
+
+# ======================
+# Agenda del día materializada
+# ======================
+# agendas_dia guarda, por (centro, día, doctor), la lista de citas del día con
+# el nombre del paciente, el motivo y el estado ya resueltos. Se mantiene de
+# forma incremental: al crear o cancelar una cita solo se reescribe la fila
+# de su día (citas/eventos.py). Para datos que no pasan por la API (bases
+# previas, semillas de benchmarks) está reconstruir_agendas().
+
+def _consulta_entradas():
+    return (
+        db.session.query(
+            Cita.id,
+            Cita.fecha,
+            Cita.duracion,
+            Cita.estado,
+            Cita.motivo,
+            Cita.paciente_id,
+            Paciente.nombre.label("paciente"),
+            Cita.centro_id,
+            Cita.doctor_id,
+        )
+        .join(Paciente, Cita.paciente_id == Paciente.id)
+    )
+
+
+def _entrada(fila):
+    return {
+        "id": fila.id,
+        "fecha": fila.fecha.isoformat(),
+        "duracion": fila.duracion,
+        "estado": fila.estado,
+        "motivo": fila.motivo,
+        "paciente_id": fila.paciente_id,
+        "paciente": fila.paciente,
+    }
+
+
+def _clave(fila):
+    return fila.centro_id, fila.fecha.date(), fila.doctor_id
+
+
+def calcular_agenda(centro_id, dia, doctor_id):
+    """Entradas de un día leídas de citas (rango de ix_citas_doctor_fecha)."""
+    inicio = datetime.combine(dia, time.min)
+    filas = (
+        _consulta_entradas()
+        .filter(
+            Cita.doctor_id == doctor_id,
+            Cita.centro_id == centro_id,
+            Cita.fecha >= inicio,
+            Cita.fecha < inicio + timedelta(days=1)
+        )
+        .order_by(Cita.fecha, Cita.id)
+        .all()
+    )
+    return [_entrada(f) for f in filas]
+
+
+def _donde(clave):
+    centro_id, dia, doctor_id = clave
+    return (
+        AgendaDia.centro_id == centro_id,
+        AgendaDia.dia == dia,
+        AgendaDia.doctor_id == doctor_id,
+    )
+
+
+def _guardar(clave, citas):
+    ahora = datetime.utcnow()
+    sentencia = update(AgendaDia).where(*_donde(clave)).values(citas=citas, actualizado=ahora)
+    if db.session.execute(sentencia).rowcount:
+        return
+
+    centro_id, dia, doctor_id = clave
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(AgendaDia).values(
+                centro_id=centro_id, dia=dia, doctor_id=doctor_id, citas=citas, actualizado=ahora
+            ))
+    except IntegrityError:
+        # Otra transacción la ha creado a la vez
+        db.session.execute(sentencia)
+
+
+# ----------------------
+# Mantenimiento incremental
+# ----------------------
+
+def actualizar_cita(cita_id):
+    """Lleva a su agenda el estado actual de la cita (recién creada o cancelada).
+    Devuelve la fila leída de la cita."""
+    fila = _consulta_entradas().filter(Cita.id == cita_id).one()
+    clave = _clave(fila)
+
+    # Las escrituras de un mismo doctor se serializan (igual que las reservas):
+    # nadie puede leer y reescribir la misma fila a la vez
+    bloquear_doctor(fila.doctor_id)
+
+    actual = db.session.execute(select(AgendaDia.citas).where(*_donde(clave))).scalar()
+    if actual is None:
+        # Primera cita del día (o agenda aún sin reconstruir): se calcula entera
+        _guardar(clave, calcular_agenda(*clave))
+        return fila
+
+    citas = [c for c in actual if c["id"] != cita_id] + [_entrada(fila)]
+    citas.sort(key=lambda c: (c["fecha"], c["id"]))
+    _guardar(clave, citas)
+    return fila
+
+
+def paciente_renombrado(paciente_id):
+    """Reescribe los días con citas del paciente (su nombre está copiado)."""
+    filas = (
+        db.session.query(Cita.centro_id, Cita.fecha, Cita.doctor_id)
+        .filter(Cita.paciente_id == paciente_id)
+        .all()
+    )
+    claves = sorted({_clave(f) for f in filas})
+
+    # Como en actualizar_cita: con los doctores bloqueados ninguna reserva o
+    # cancelación puede confirmarse entre el cálculo y la escritura. Orden
+    # fijo para que dos renombrados no se bloqueen mutuamente.
+    for doctor_id in sorted({doctor_id for _, _, doctor_id in claves}):
+        bloquear_doctor(doctor_id)
+
+    for clave in claves:
+        _guardar(clave, calcular_agenda(*clave))
+
+
+def reconstruir_agendas():
+    """Rehace agendas_dia desde citas, doctor a doctor."""
+    db.session.execute(delete(AgendaDia))
+    pares = db.session.query(Cita.centro_id, Cita.doctor_id).distinct().all()
+    ahora = datetime.utcnow()
+
+    for centro_id, doctor_id in pares:
+        filas = (
+            _consulta_entradas()
+            .filter(Cita.centro_id == centro_id, Cita.doctor_id == doctor_id)
+            .order_by(Cita.fecha, Cita.id)
+            .all()
+        )
+        db.session.execute(insert(AgendaDia), [
+            {"centro_id": centro_id, "dia": dia, "doctor_id": doctor_id,
+             "citas": [_entrada(f) for f in grupo], "actualizado": ahora}
+            for dia, grupo in groupby(filas, key=lambda f: f.fecha.date())
+        ])
+        db.session.commit()
+
+    db.session.commit()
+
+
+# ======================
+# Lectura
+# ======================
+
+def leer_agenda(dia, centro_id, doctor_id=None):
+    """[(doctor_id, citas)] del centro ese día; con doctor_id, solo su fila."""
+    query = (
+        select(AgendaDia.doctor_id, AgendaDia.citas)
+        .where(AgendaDia.centro_id == centro_id, AgendaDia.dia == dia)
+    )
+    if doctor_id is not None:
+        query = query.where(AgendaDia.doctor_id == doctor_id)
+
+    return db.session.execute(query.order_by(AgendaDia.doctor_id)).all()
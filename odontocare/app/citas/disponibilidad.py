@@ -0,0 +1,114 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import Cita, Horario
+
+
+# ======================
+# Búsqueda de huecos libres
+# ======================
+# Las citas de todos los doctores se leen con UNA consulta de rango y se
+# agrupan en intervalos ordenados por doctor. Cada hueco candidato se comprueba
+# con una búsqueda binaria, sin volver a la base de datos.
+
+
+class Ocupacion:
+    """Intervalos ocupados de un doctor, fusionados y ordenados."""
+
+    def __init__(self, intervalos):
+        self.inicios = []
+        self.fines = []
+
+        for inicio, fin in sorted(intervalos):
+            if self.fines and inicio <= self.fines[-1]:
+                self.fines[-1] = max(self.fines[-1], fin)
+            else:
+                self.inicios.append(inicio)
+                self.fines.append(fin)
+
+    def libre(self, inicio, fin):
+        # Primer intervalo que termina después de `inicio`
+        i = bisect_right(self.fines, inicio)
+        return i == len(self.inicios) or self.inicios[i] >= fin
+
+
+def _hora(valor):
+    return valor if isinstance(valor, time) else time.fromisoformat(valor)
+
+
+def plantillas_horario(doctor_ids):
+    """{doctor_id: {dia_semana: [(hora_inicio, hora_fin), ...]}} en una consulta."""
+    por_defecto = {
+        dia: [(_hora(i), _hora(f)) for i, f in tramos]
+        for dia, tramos in current_app.config["HORARIO_POR_DEFECTO"].items()
+    }
+
+    propias = defaultdict(lambda: defaultdict(list))
+    filas = (
+        db.session.query(Horario.doctor_id, Horario.dia_semana, Horario.hora_inicio, Horario.hora_fin)
+        .filter(Horario.doctor_id.in_(doctor_ids))
+        .order_by(Horario.hora_inicio)
+    )
+    for doctor_id, dia, inicio, fin in filas:
+        propias[doctor_id][dia].append((inicio, fin))
+
+    return {d: propias[d] if d in propias else por_defecto for d in doctor_ids}
+
+
+def ocupacion_doctores(doctor_ids, desde, hasta):
+    """{doctor_id: Ocupacion} con las citas activas que tocan [desde, hasta)."""
+    maxima = timedelta(minutes=current_app.config["CITA_DURACION_MAXIMA"])
+
+    intervalos = defaultdict(list)
+    filas = (
+        db.session.query(Cita.doctor_id, Cita.fecha, Cita.fecha_fin)
+        .filter(
+            Cita.doctor_id.in_(doctor_ids),
+            Cita.estado != "CANCELADA",
+            Cita.fecha > desde - maxima,
+            Cita.fecha < hasta,
+            Cita.fecha_fin > desde
+        )
+    )
+    for doctor_id, inicio, fin in filas:
+        intervalos[doctor_id].append((inicio, fin))
+
+    return {d: Ocupacion(intervalos[d]) for d in doctor_ids}
+
+
+def huecos_libres(doctor_ids, desde, hasta, duracion, paso=None):
+    """{doctor_id: [inicio, ...]} con los huecos de `duracion` minutos libres.
+
+    Los candidatos se alinean al inicio de cada tramo del horario cada `paso`
+    minutos (por defecto, la propia duración)."""
+    duracion = timedelta(minutes=duracion)
+    paso = timedelta(minutes=paso) if paso else duracion
+
+    plantillas = plantillas_horario(doctor_ids)
+    ocupacion = ocupacion_doctores(doctor_ids, desde, hasta)
+
+    resultado = {}
+    for doctor_id in doctor_ids:
+        huecos = []
+        dia = desde.date()
+
+        while dia <= hasta.date():
+            for hora_inicio, hora_fin in plantillas[doctor_id].get(dia.weekday(), []):
+                inicio = datetime.combine(dia, hora_inicio)
+                fin_tramo = datetime.combine(dia, hora_fin)
+
+                while inicio + duracion <= fin_tramo:
+                    fin = inicio + duracion
+                    if inicio >= desde and fin <= hasta and ocupacion[doctor_id].libre(inicio, fin):
+                        huecos.append(inicio)
+                    inicio += paso
+
+            dia += timedelta(days=1)
+
+        resultado[doctor_id] = huecos
+
+    return resultado
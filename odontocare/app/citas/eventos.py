@@ -0,0 +1,209 @@
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Cita, CambioCita, Paciente, Doctor, Centro
+from app.utils.versiones import incrementar_versiones
+from app.utils.serializacion import codificar
+from app.citas.agenda import actualizar_cita
+from app.citas.resumen import contar_cita, cambiar_estado
+
+
+# ======================
+# Eventos de citas
+# ======================
+# Todo lo que hay que hacer al crear o cancelar una cita, en la misma
+# transacción: agenda del día, resumen para informes, versión de la tabla
+# (ETag) y registro de cambios (feed).
+#
+# La versión de "citas" se incrementa ya, no al confirmar: así la fila queda
+# bloqueada hasta el commit y los ids de cambios_citas se asignan en el mismo
+# orden en que se confirman. Un lector con since=N nunca ve N+2 antes que N+1.
+
+def cita_creada(cita_id):
+    fila = actualizar_cita(cita_id)
+    contar_cita(fila)
+    _registrar("CREADA", fila)
+
+
+def cita_cancelada(cita_id, estado_anterior):
+    # estado_anterior puede ser NULL (citas antiguas): se descuenta de SIN_ESTADO
+    fila = actualizar_cita(cita_id)
+    cambiar_estado(fila, estado_anterior)
+    _registrar("CANCELADA", fila)
+
+
+# Primero la agenda (actualizar_cita): bloquea el doctor antes que la fila de
+# versión, en el mismo orden que crear_cita, para que crear y cancelar no se
+# bloqueen mutuamente. El resumen usa filas del mismo doctor, ya bloqueado.
+
+def _registrar(tipo, fila):
+    incrementar_versiones(db.session, ["citas"])
+    db.session.execute(
+        insert(CambioCita).values(
+            tipo=tipo,
+            cita_id=fila.id,
+            creado=datetime.utcnow(),
+            estado=fila.estado,
+            paciente_id=fila.paciente_id,
+            doctor_id=fila.doctor_id,
+            centro_id=fila.centro_id
+        )
+    )
+    db.session.info["cambios_citas"] = True
+
+
+# ----------------------
+# Aviso a los lectores del feed
+# ----------------------
+# Las peticiones que esperan en este proceso se despiertan al confirmar un
+# cambio. Los cambios hechos por otros procesos se ven en la siguiente
+# consulta (CAMBIOS_INTERVALO).
+
+_aviso = threading.Condition()
+_generacion = 0
+
+
+@event.listens_for(Session, "after_commit")
+def _avisar_tras_commit(session):
+    global _generacion
+    if session.info.pop("cambios_citas", None):
+        with _aviso:
+            _generacion += 1
+            _aviso.notify_all()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_aviso(session):
+    session.info.pop("cambios_citas", None)
+
+
+def generacion_actual():
+    return _generacion
+
+
+def esperar_cambios(generacion, segundos):
+    # Si ya hubo un commit desde que se leyó la generación no se espera
+    with _aviso:
+        if _generacion == generacion:
+            _aviso.wait(segundos)
+
+
+# ======================
+# Lectura del feed
+# ======================
+
+def ultimo_cambio():
+    return db.session.query(func.max(CambioCita.id)).scalar() or 0
+
+
+# Cada cambio sale con la copia guardada al registrarlo (estado e ids de
+# paciente, doctor y centro): al releer el feed desde el principio, una cita
+# creada y luego cancelada aparece primero PENDIENTE y después CANCELADA.
+# Del resto (fecha, motivo, nombres) se muestra lo actual.
+
+def consulta_cambios():
+    """Como consulta_citas(), con seq, tipo y creado. Se filtra por rol con
+    las columnas de CambioCita."""
+    return (
+        db.session.query(
+            CambioCita.id.label("seq"),
+            CambioCita.tipo,
+            CambioCita.creado,
+            Cita.id,
+            Cita.fecha,
+            Cita.duracion,
+            CambioCita.estado,
+            Cita.motivo,
+            Cita.id_usuario_registra,
+            Paciente.nombre.label("paciente"),
+            Doctor.nombre.label("doctor"),
+            Centro.nombre.label("centro"),
+        )
+        .join(Cita, CambioCita.cita_id == Cita.id)
+        .join(Paciente, CambioCita.paciente_id == Paciente.id)
+        .join(Doctor, CambioCita.doctor_id == Doctor.id)
+        .join(Centro, CambioCita.centro_id == Centro.id)
+    )
+
+
+def leer_cambios(query, desde):
+    """query es consulta_cambios() ya filtrada por rol."""
+    return (
+        query
+        .filter(CambioCita.id > desde)
+        .order_by(CambioCita.id)
+        .limit(current_app.config["CAMBIOS_LOTE"])
+        .all()
+    )
+
+
+def esperar_cambios_nuevos(query, desde, segundos):
+    """Long-poll: devuelve en cuanto hay cambios o se agota el tiempo."""
+    limite = time.monotonic() + segundos
+    intervalo = current_app.config["CAMBIOS_INTERVALO"]
+
+    while True:
+        generacion = generacion_actual()
+        cambios = leer_cambios(query, desde)
+
+        # Termina la transacción de lectura: libera la conexión mientras se
+        # espera y la siguiente consulta ve lo confirmado entretanto
+        db.session.rollback()
+
+        restante = limite - time.monotonic()
+        if cambios or restante <= 0:
+            return cambios
+
+        esperar_cambios(generacion, min(intervalo, restante))
+
+
+# ----------------------
+# Server-Sent Events
+# ----------------------
+# Cada cambio se envía como un evento con id = seq: si la conexión se corta,
+# el navegador reconecta con la cabecera Last-Event-ID y sigue donde estaba.
+# El stream se cierra tras CAMBIOS_SSE_DURACION para no ocupar un hilo del
+# servidor indefinidamente.
+
+def _sse(query, desde, serializar):
+    config = current_app.config
+    fin = time.monotonic() + config["CAMBIOS_SSE_DURACION"]
+    latido = time.monotonic() + config["CAMBIOS_LATIDO"]
+
+    yield "retry: 3000\n\n"
+
+    while time.monotonic() < fin:
+        generacion = generacion_actual()
+        cambios = leer_cambios(query, desde)
+        db.session.rollback()
+
+        for cambio in cambios:
+            datos = codificar(serializar(cambio)).decode()
+            yield f"id: {cambio.seq}\nevent: {cambio.tipo}\ndata: {datos}\n\n"
+            desde = cambio.seq
+
+        if cambios:
+            latido = time.monotonic() + config["CAMBIOS_LATIDO"]
+            continue
+
+        if time.monotonic() >= latido:
+            yield ": ping\n\n"
+            latido = time.monotonic() + config["CAMBIOS_LATIDO"]
+
+        esperar_cambios(generacion, config["CAMBIOS_INTERVALO"])
+
+
+def respuesta_sse(query, desde, serializar):
+    respuesta = Response(
+        stream_with_context(_sse(query, desde, serializar)),
+        mimetype="text/event-stream"
+    )
+    respuesta.headers["Cache-Control"] = "no-cache"
+    respuesta.headers["X-Accel-Buffering"] = "no"  # sin buffer en nginx
+    return respuesta
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import and_, exists, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Cita, Doctor
+
+
+# ======================
+# Reservas sin solapes
+# ======================
+# La comprobación de solape y la inserción van en una sola sentencia
+# (INSERT ... SELECT ... WHERE NOT EXISTS), así dos peticiones concurrentes no
+# pueden pasar las dos la comprobación. El índice único parcial
+# uq_citas_doctor_fecha_activa es la última barrera para la misma hora exacta.
+
+
+def condicion_solape(doctor_id, inicio, fin):
+    """Citas activas del doctor que se solapan con [inicio, fin).
+
+    El límite inferior (inicio - duración máxima) convierte la búsqueda en un
+    rango acotado sobre el índice (doctor_id, fecha)."""
+    maxima = timedelta(minutes=current_app.config["CITA_DURACION_MAXIMA"])
+
+    return and_(
+        Cita.doctor_id == doctor_id,
+        Cita.estado != "CANCELADA",
+        Cita.fecha > inicio - maxima,
+        Cita.fecha < fin,
+        Cita.fecha_fin > inicio
+    )
+
+
+def bloquear_doctor(doctor_id):
+    # En PostgreSQL serializa las reservas del mismo doctor (SELECT ... FOR
+    # UPDATE) y las escrituras de su agenda (citas/agenda.py). SQLite ya
+    # serializa las escrituras y no admite FOR UPDATE.
+    if db.session.get_bind().dialect.name != "sqlite":
+        db.session.execute(
+            select(Doctor.id).where(Doctor.id == doctor_id).with_for_update()
+        )
+
+
+def insertar_si_libre(**valores):
+    """Inserta la cita si el hueco está libre. Devuelve el id o None si hay solape."""
+    bloquear_doctor(valores["doctor_id"])
+
+    columnas = Cita.__table__.c
+    hueco_libre = ~exists().where(
+        condicion_solape(valores["doctor_id"], valores["fecha"], valores["fecha_fin"])
+    )
+    origen = select(
+        *[literal(v, columnas[k].type).label(k) for k, v in valores.items()]
+    ).where(hueco_libre)
+
+    sentencia = insert(Cita).from_select(list(valores), origen).returning(Cita.id)
+
+    try:
+        return db.session.execute(sentencia).scalar()
+    except IntegrityError:
+        db.session.rollback()
+        return None
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Cita, ResumenCitas, ResumenCitasMes
+
+
+# ======================
+# Resumen de citas para informes
+# ======================
+# Contadores por (día, centro, doctor, estado) en resumen_citas y por (mes,
+# centro, doctor, estado) en resumen_citas_mes. Crear una cita suma 1 en su
+# estado; cancelarla resta 1 en el estado anterior y suma 1 en CANCELADA.
+# Las filas de un doctor solo se tocan con el doctor bloqueado
+# (citas/agenda.py), así que los incrementos no se pisan.
+
+SIN_ESTADO = "SIN_ESTADO"  # citas con estado NULL (la clave no admite NULL)
+
+
+def semana_de(dia):
+    return dia - timedelta(days=dia.weekday())
+
+
+def mes_de(dia):
+    return dia.replace(day=1)
+
+
+def _sumar(modelo, clave, citas, minutos, **calculadas):
+    sentencia = (
+        update(modelo)
+        .where(*(getattr(modelo, columna) == valor for columna, valor in clave.items()))
+        .values(citas=modelo.citas + citas, minutos=modelo.minutos + minutos)
+    )
+    if db.session.execute(sentencia).rowcount:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(modelo).values(**clave, **calculadas, citas=citas, minutos=minutos))
+    except IntegrityError:
+        # Otra transacción la ha creado a la vez
+        db.session.execute(sentencia)
+
+
+def _contar(fila, estado, citas, minutos):
+    dia = fila.fecha.date()
+    clave = {"centro_id": fila.centro_id, "doctor_id": fila.doctor_id, "estado": estado}
+    _sumar(ResumenCitas, dict(clave, dia=dia), citas, minutos, semana=semana_de(dia), mes=mes_de(dia))
+    _sumar(ResumenCitasMes, dict(clave, mes=mes_de(dia)), citas, minutos)
+
+
+def contar_cita(fila):
+    """Cita nueva. fila: cita con fecha, duracion, estado, centro_id y doctor_id."""
+    _contar(fila, fila.estado or SIN_ESTADO, 1, fila.duracion)
+
+
+def cambiar_estado(fila, estado_anterior):
+    """Pasa la cita de estado_anterior (NULL incluido) a su estado actual."""
+    _contar(fila, estado_anterior or SIN_ESTADO, -1, -fila.duracion)
+    _contar(fila, fila.estado or SIN_ESTADO, 1, fila.duracion)
+
+
+def reconstruir_resumen(lote=10_000):
+    """Rehace resumen_citas y resumen_citas_mes agregando citas en la base de datos."""
+    db.session.execute(delete(ResumenCitas))
+    db.session.execute(delete(ResumenCitasMes))
+
+    dia = func.date(Cita.fecha)
+    filas = (
+        db.session.query(
+            dia.label("dia"),
+            Cita.centro_id,
+            Cita.doctor_id,
+            Cita.estado,
+            func.count(Cita.id),
+            func.sum(Cita.duracion)
+        )
+        .group_by(dia, Cita.centro_id, Cita.doctor_id, Cita.estado)
+        .all()
+    )
+
+    diarias = []
+    mensuales = defaultdict(lambda: [0, 0])
+    for texto_dia, centro_id, doctor_id, estado, citas, minutos in filas:
+        # date() devuelve texto en SQLite y date en PostgreSQL
+        d = texto_dia if isinstance(texto_dia, date) else date.fromisoformat(texto_dia)
+        estado, minutos = estado or SIN_ESTADO, minutos or 0
+        diarias.append({
+            "dia": d, "centro_id": centro_id, "doctor_id": doctor_id,
+            "estado": estado, "semana": semana_de(d), "mes": mes_de(d),
+            "citas": citas, "minutos": minutos
+        })
+        acumulado = mensuales[(mes_de(d), centro_id, doctor_id, estado)]
+        acumulado[0] += citas
+        acumulado[1] += minutos
+
+    mensuales = [
+        {"mes": mes, "centro_id": centro_id, "doctor_id": doctor_id, "estado": estado,
+         "citas": citas, "minutos": minutos}
+        for (mes, centro_id, doctor_id, estado), (citas, minutos) in mensuales.items()
+    ]
+
+    for modelo, valores in ((ResumenCitas, diarias), (ResumenCitasMes, mensuales)):
+        for i in range(0, len(valores), lote):
+            db.session.execute(insert(modelo), valores[i:i + lote])
+    db.session.commit()
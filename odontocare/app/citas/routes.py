@@ -1,11 +1,124 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from datetime import date, datetime, timedelta
 from app.extensions import db
-from app.models import Cita, Paciente, Doctor, Centro,User
+from app.models import Cita, CambioCita, Paciente, Doctor, Centro
+from app.utils.security import identidad_actual
+from app.utils.validacion import parsear_id, parsear_fecha
+from app.utils.paginacion import leer_parametros_pagina, paginar, pagina
+from app.utils.exportacion import formato_exportacion, respuesta_exportacion
+from app.citas.reservas import insertar_si_libre
+from app.citas.disponibilidad import huecos_libres
+from app.utils.catalogo import obtener_centro, obtener_doctor
+from app.utils.versiones import condicional
+from app.utils.serializacion import ESQUEMA_CITA
+from app.citas.agenda import leer_agenda
+from app.citas.eventos import (
+    cita_creada, cita_cancelada, consulta_cambios, ultimo_cambio, esperar_cambios_nuevos,
+    respuesta_sse
+)
 
 citas_bp = Blueprint("citas", __name__)
 
+
+# ----------------------
+# Consulta base de citas
+# ----------------------
+# Una sola SELECT con JOIN a pacientes, doctores y centros que proyecta solo
+# las columnas que se serializan. Evita las cargas perezosas (lazy=True) de
+# c.paciente / c.doctor / c.centro, que costaban 3 consultas extra por fila.
+
+def consulta_citas():
+    return (
+        db.session.query(
+            Cita.id,
+            Cita.fecha,
+            Cita.duracion,
+            Cita.estado,
+            Cita.motivo,
+            Cita.id_usuario_registra,
+            Paciente.nombre.label("paciente"),
+            Doctor.nombre.label("doctor"),
+            Centro.nombre.label("centro"),
+        )
+        .join(Paciente, Cita.paciente_id == Paciente.id)
+        .join(Doctor, Cita.doctor_id == Doctor.id)
+        .join(Centro, Cita.centro_id == Centro.id)
+    )
+
+
+
+
+# ----------------------
+# Citas visibles por rol
+# ----------------------
+# Paciente y médico solo ven sus citas; secretaria y admin, todas.
+# Devuelve None si el usuario no tiene paciente/doctor asociado.
+
+def filtrar_por_rol(query, user, modelo=Cita):
+    # modelo: Cita o CambioCita (el feed filtra por la copia del cambio)
+    if user.rol == "paciente":
+        if not user.paciente_id:
+            return None
+        return query.filter(modelo.paciente_id == user.paciente_id)
+
+    if user.rol == "medico":
+        if not user.doctor_id:
+            return None
+        return query.filter(modelo.doctor_id == user.doctor_id)
+
+    return query
+
+
+def filtrar_ids(query, modelo=Cita):
+    # Secretaria y admin. Lanza ValueError si algún id no es numérico
+    for nombre in ("paciente_id", "doctor_id", "centro_id"):
+        valor = request.args.get(nombre)
+        if valor:
+            query = query.filter(getattr(modelo, nombre) == parsear_id(valor, nombre))
+    return query
+
+
+# ----------------------
+# Rango de fechas (todos los roles)
+# ----------------------
+#   ?dia=2025-03-14                 citas de ese día
+#   ?desde=...&hasta=...            [desde, hasta) en ISO 8601, cada uno opcional
+# Con el filtro de rol o de centro/doctor la consulta es un recorrido por rango
+# de ix_citas_{paciente,doctor,centro}_fecha, que ya devuelve las filas en el
+# orden (fecha, id) de la paginación.
+
+def filtrar_fechas(query):
+    # Lanza ValueError si alguna fecha no es válida
+    desde = request.args.get("desde")
+    hasta = request.args.get("hasta")
+    dia = request.args.get("dia")
+
+    try:
+        desde = parsear_fecha(desde) if desde else None
+        hasta = parsear_fecha(hasta) if hasta else None
+    except ValueError:
+        raise ValueError("desde y hasta deben ser fechas ISO 8601")
+
+    if dia:
+        try:
+            inicio_dia = datetime.combine(date.fromisoformat(dia), datetime.min.time())
+        except ValueError:
+            raise ValueError("dia debe tener el formato AAAA-MM-DD")
+        desde = max(desde, inicio_dia) if desde else inicio_dia
+        fin_dia = inicio_dia + timedelta(days=1)
+        hasta = min(hasta, fin_dia) if hasta else fin_dia
+
+    if desde and hasta and desde >= hasta:
+        raise ValueError("desde debe ser anterior a hasta")
+
+    if desde:
+        query = query.filter(Cita.fecha >= desde)
+    if hasta:
+        query = query.filter(Cita.fecha < hasta)
+    return query
+
+
 # ======================
 # Crear cita
 # ======================
@@ -29,13 +142,23 @@ def crear_cita():
             "error": "doctor_id, centro_id y fecha son obligatorios"
         }), 400
 
-    # Usuario autenticado
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    # Una cita nace PENDIENTE: con estado NULL o CANCELADA escaparía de la
+    # comprobación de solape y del índice único (estado != 'CANCELADA')
+    if estado != "PENDIENTE":
+        return jsonify({"error": "estado solo puede ser PENDIENTE al crear una cita"}), 400
+
+    try:
+        doctor_id = parsear_id(doctor_id, "doctor_id")
+        centro_id = parsear_id(centro_id, "centro_id")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Usuario autenticado (claims del token)
+    user = identidad_actual()
 
     # Determinar paciente según rol
     if user.rol == "paciente":
-        paciente = Paciente.query.filter_by(id_usuario=user.id).first()
+        paciente = Paciente.query.get(user.paciente_id) if user.paciente_id else None
         if not paciente:
             return jsonify({"error": "Paciente no válido"}), 400
         paciente_id = paciente.id
@@ -43,19 +166,31 @@ def crear_cita():
         paciente_id = data.get("paciente_id")
         if not paciente_id:
             return jsonify({"error": "paciente_id es obligatorio"}), 400
+        try:
+            paciente_id = parsear_id(paciente_id, "paciente_id")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         paciente = Paciente.query.get(paciente_id)
         if not paciente:
             return jsonify({"error": "Paciente no existe"}), 404
 
     # Validar fecha
     try:
-        fecha_dt = datetime.fromisoformat(fecha)
+        fecha_dt = parsear_fecha(fecha)
     except ValueError:
         return jsonify({"error": "Formato de fecha inválido (ISO 8601)"}), 400
 
-    # Validaciones de existencia
-    doctor = Doctor.query.get(doctor_id)
-    centro = Centro.query.get(centro_id)
+    # Validar duración (minutos)
+    duracion = data.get("duracion", current_app.config["CITA_DURACION_DEFECTO"])
+    maxima = current_app.config["CITA_DURACION_MAXIMA"]
+    if isinstance(duracion, bool) or not isinstance(duracion, int) or not 0 < duracion <= maxima:
+        return jsonify({
+            "error": f"duracion debe ser un entero entre 1 y {maxima} minutos"
+        }), 400
+
+    # Validaciones de existencia (catálogo cacheado)
+    doctor = obtener_doctor(doctor_id)
+    centro = obtener_centro(centro_id)
 
     if not doctor:
         return jsonify({"error": "Doctor no existe"}), 404
@@ -69,41 +204,39 @@ def crear_cita():
     if doctor.centro_id != centro.id:
         return jsonify({"error": "El doctor no pertenece a este centro"}), 400
 
-    # Evitar doble reserva
-    cita_existente = Cita.query.filter_by(
-        doctor_id=doctor_id,
-        fecha=fecha_dt
-    ).first()
-
-    if cita_existente:
-        return jsonify({
-            "error": "El doctor ya tiene una cita en esa fecha y hora"
-        }), 409
-
-    # Crear cita
-    cita = Cita(
+    # Crear cita solo si el doctor no tiene otra cita que se solape
+    # (comprobación e inserción atómicas, ver citas/reservas.py)
+    cita_id = insertar_si_libre(
         fecha=fecha_dt,
+        duracion=duracion,
+        fecha_fin=fecha_dt + timedelta(minutes=duracion),
         motivo=motivo,
         estado=estado,
         paciente_id=paciente.id,
         doctor_id=doctor.id,
         centro_id=centro.id,
-        id_usuario_registra=user.id
+        id_usuario_registra=user.user_id
     )
 
-    db.session.add(cita)
+    if cita_id is None:
+        return jsonify({
+            "error": "El doctor ya tiene una cita que se solapa con ese horario"
+        }), 409
+
+    cita_creada(cita_id)
     db.session.commit()
 
     return jsonify({
         "message": "Cita creada correctamente",
         "cita": {
-            "id": cita.id,
-            "fecha": cita.fecha.isoformat(),
-            "estado": cita.estado,
+            "id": cita_id,
+            "fecha": fecha_dt,
+            "duracion": duracion,
+            "estado": estado,
             "paciente": paciente.nombre,
             "doctor": doctor.nombre,
             "centro": centro.nombre,
-            "motivo": cita.motivo,
+            "motivo": motivo,
             "usuario_registra": user.username
         }
     }), 201
@@ -115,43 +248,43 @@ def crear_cita():
 
 @citas_bp.route("/", methods=["GET"])
 @jwt_required()
+@condicional("citas", "pacientes", "doctores", "centros")
 def listar_citas():
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = identidad_actual()
 
-    query = Cita.query
+    try:
+        limite, cursor = leer_parametros_pagina()
+        formato = formato_exportacion()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # ======================
-    # PACIENTE → solo sus citas
+    # PACIENTE / DOCTOR → solo sus citas
     # ======================
-    
-    if user.rol == "paciente":
-        paciente = Paciente.query.filter_by(id_usuario=user.id).first()
-        if not paciente:
-            return jsonify([]), 200
 
-        query = query.filter_by(paciente_id=paciente.id)
-
-    # ======================
-    # DOCTOR → solo sus citas
-    # ======================
-    
-    elif user.rol == "medico":
-        doctor = Doctor.query.filter_by(id_usuario=user.id).first()
-        if not doctor:
-            return jsonify([]), 200
+    query = filtrar_por_rol(consulta_citas(), user)
+    if query is None:
+        return jsonify({"items": [], "next_cursor": None}), 200
 
-        query = query.filter_by(doctor_id=doctor.id)
+    # Todos los roles: dia / desde / hasta
+    try:
+        query = filtrar_fechas(query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # ======================
-    # SECRETARIA → filtra por fecha
+    # SECRETARIA → filtra por fecha, centro y doctor
     # ======================
     
-    elif user.rol == "secretaria":
+    if user.rol == "secretaria":
         fecha = request.args.get("fecha")
+        try:
+            query = filtrar_ids(query)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if fecha:
             try:
-                fecha_dt = datetime.fromisoformat(fecha)
+                fecha_dt = parsear_fecha(fecha)
                 query = query.filter(Cita.fecha == fecha_dt)
             except ValueError:
                 return jsonify({"error": "Formato de fecha inválido"}), 400
@@ -161,41 +294,246 @@ def listar_citas():
     # ======================
     
     elif user.rol == "admin":
-        paciente_id = request.args.get("paciente_id")
-        doctor_id = request.args.get("doctor_id")
-        centro_id = request.args.get("centro_id")
         estado = request.args.get("estado")
         fecha = request.args.get("fecha")
 
-        if paciente_id:
-            query = query.filter(Cita.paciente_id == int(paciente_id))
-        if doctor_id:
-            query = query.filter(Cita.doctor_id == int(doctor_id))
-        if centro_id:
-            query = query.filter(Cita.centro_id == int(centro_id))
+        try:
+            query = filtrar_ids(query)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if estado:
             query = query.filter(Cita.estado == estado)
         if fecha:
             try:
-                fecha_dt = datetime.fromisoformat(fecha)
+                fecha_dt = parsear_fecha(fecha)
                 query = query.filter(Cita.fecha == fecha_dt)
             except ValueError:
                 return jsonify({"error": "Formato de fecha inválido"}), 400
 
-    citas = query.all()
-
-    return jsonify([
-        {
-            "id": c.id,
-            "fecha": c.fecha.isoformat(),
-            "estado": c.estado,
-            "motivo": c.motivo,
-            "paciente": c.paciente.nombre,
-            "doctor": c.doctor.nombre,
-            "centro": c.centro.nombre
-        }
-        for c in citas
-    ]), 200
+    # Exportación completa en streaming (?format=ndjson|csv)
+    if formato:
+        return respuesta_exportacion(
+            query.order_by(Cita.fecha, Cita.id),
+            formato, ESQUEMA_CITA, "citas"
+        )
+
+    # Página ordenada por (fecha, id); el cursor apunta a la última fila
+    try:
+        query = paginar(query, [Cita.fecha, Cita.id], limite, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    citas, next_cursor = pagina(query.all(), limite, ["fecha", "id"])
+
+    return jsonify({
+        "items": ESQUEMA_CITA.filas(citas),
+        "next_cursor": next_cursor
+    }), 200
+
+
+# ======================
+# Agenda del día
+# ======================
+# GET /citas/agenda?dia=AAAA-MM-DD&doctor_id=N  -> una fila de agendas_dia
+# GET /citas/agenda?dia=AAAA-MM-DD&centro_id=N  -> todos los doctores del centro
+# Se lee de la agenda materializada (citas/agenda.py): clave primaria, sin
+# JOIN. El médico solo ve la suya; el paciente no tiene acceso (la agenda
+# muestra a otros pacientes).
+
+@citas_bp.route("/agenda", methods=["GET"])
+@jwt_required()
+@condicional("citas", "pacientes")
+def agenda_dia():
+    user = identidad_actual()
+
+    if user.rol == "paciente":
+        return jsonify({"error": "No tienes permisos para consultar agendas"}), 403
+
+    dia = request.args.get("dia")
+    if not dia:
+        return jsonify({"error": "dia es obligatorio (AAAA-MM-DD)"}), 400
+    try:
+        dia = date.fromisoformat(dia)
+    except ValueError:
+        return jsonify({"error": "dia debe tener el formato AAAA-MM-DD"}), 400
+
+    try:
+        if user.rol == "medico":
+            if not user.doctor_id:
+                return jsonify({"error": "Doctor no válido"}), 400
+            doctor_id, centro_id = user.doctor_id, None
+        else:
+            doctor_id = request.args.get("doctor_id")
+            centro_id = request.args.get("centro_id")
+            doctor_id = parsear_id(doctor_id, "doctor_id") if doctor_id else None
+            centro_id = parsear_id(centro_id, "centro_id") if centro_id else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if doctor_id:
+        doctor = obtener_doctor(doctor_id)
+        if not doctor:
+            return jsonify({"error": "Doctor no existe"}), 404
+        if centro_id and centro_id != doctor.centro_id:
+            return jsonify({"error": "El doctor no pertenece a este centro"}), 400
+        centro_id = doctor.centro_id
+    elif centro_id:
+        if not obtener_centro(centro_id):
+            return jsonify({"error": "Centro no existe"}), 404
+    else:
+        return jsonify({"error": "doctor_id o centro_id es obligatorio"}), 400
+
+    filas = leer_agenda(dia, centro_id, doctor_id)
+
+    return jsonify({
+        "dia": dia,
+        "centro_id": centro_id,
+        "agendas": [
+            {"doctor_id": f.doctor_id, "doctor": obtener_doctor(f.doctor_id).nombre, "citas": f.citas}
+            for f in filas
+        ]
+    }), 200
+
+
+# ======================
+# Feed de cambios
+# ======================
+# GET /citas/cambios?since=N devuelve los cambios con seq > N que el usuario
+# puede ver (mismas reglas que el listado). Sin since empieza en el último.
+#   - JSON (long-poll): espera hasta timeout segundos a que haya alguno.
+#   - Accept: text/event-stream: stream SSE continuo.
+
+def serializar_cambio(c):
+    return {
+        "seq": c.seq,
+        "tipo": c.tipo,
+        "creado": c.creado,
+        "cita": ESQUEMA_CITA.fila(c)
+    }
+
+
+@citas_bp.route("/cambios", methods=["GET"])
+@jwt_required()
+def cambios_citas():
+    user = identidad_actual()
+
+    query = filtrar_por_rol(consulta_cambios(), user, CambioCita)
+
+    if query is not None and user.rol in ("admin", "secretaria"):
+        try:
+            query = filtrar_ids(query, CambioCita)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # Last-Event-ID: reconexión automática del navegador (SSE)
+    desde = request.headers.get("Last-Event-ID") or request.args.get("since")
+    if desde is None:
+        desde = ultimo_cambio()
+    else:
+        # isdigit() acepta "²" o "٣", que int() no convierte
+        try:
+            desde = int(desde)
+        except ValueError:
+            desde = -1
+        if desde < 0:
+            return jsonify({"error": "since debe ser un entero >= 0"}), 400
+
+    espera_maxima = current_app.config["CAMBIOS_ESPERA_MAXIMA"]
+    espera = request.args.get("timeout", espera_maxima, type=int)
+    espera = max(0, min(espera, espera_maxima))
+
+    sse = request.accept_mimetypes.best_match(
+        ["application/json", "text/event-stream"], default="application/json"
+    ) == "text/event-stream"
+
+    if query is None:
+        return jsonify({"items": [], "next_since": desde}), 200
+
+    if sse:
+        return respuesta_sse(query, desde, serializar_cambio)
+
+    cambios = esperar_cambios_nuevos(query, desde, espera)
+
+    return jsonify({
+        "items": [serializar_cambio(c) for c in cambios],
+        "next_since": cambios[-1].seq if cambios else desde
+    }), 200
+
+
+# ======================
+# Disponibilidad de doctores
+# ======================
+
+@citas_bp.route("/disponibilidad", methods=["GET"])
+@jwt_required()
+def disponibilidad():
+    try:
+        doctor_id = request.args.get("doctor_id")
+        centro_id = request.args.get("centro_id")
+        doctor_id = parsear_id(doctor_id, "doctor_id") if doctor_id else None
+        centro_id = parsear_id(centro_id, "centro_id") if centro_id else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not doctor_id and not centro_id:
+        return jsonify({"error": "doctor_id o centro_id es obligatorio"}), 400
+
+    try:
+        desde = request.args.get("desde")
+        desde = parsear_fecha(desde) if desde else datetime.now().replace(second=0, microsecond=0)
+        hasta = request.args.get("hasta")
+        hasta = parsear_fecha(hasta) if hasta else desde + timedelta(days=7)
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido (ISO 8601)"}), 400
+
+    dias_maximo = current_app.config["DISPONIBILIDAD_DIAS_MAXIMO"]
+    if hasta <= desde or hasta - desde > timedelta(days=dias_maximo):
+        return jsonify({
+            "error": f"hasta debe ser posterior a desde y como máximo {dias_maximo} días después"
+        }), 400
+
+    duracion = request.args.get("duracion")
+    paso = request.args.get("paso")
+    maxima = current_app.config["CITA_DURACION_MAXIMA"]
+    try:
+        duracion = parsear_id(duracion, "duracion") if duracion else current_app.config["CITA_DURACION_DEFECTO"]
+    except ValueError:
+        duracion = None
+    if not duracion or duracion > maxima:
+        return jsonify({
+            "error": f"duracion debe ser un entero entre 1 y {maxima} minutos"
+        }), 400
+    try:
+        paso = parsear_id(paso, "paso") if paso else None
+    except ValueError:
+        return jsonify({"error": "paso debe ser un entero positivo (minutos)"}), 400
+
+    query = db.session.query(Doctor.id, Doctor.nombre, Doctor.centro_id)
+    if doctor_id:
+        query = query.filter(Doctor.id == doctor_id)
+    if centro_id:
+        query = query.filter(Doctor.centro_id == centro_id)
+    doctores = query.order_by(Doctor.id).all()
+
+    if doctor_id and not doctores:
+        return jsonify({"error": "Doctor no existe en ese centro" if centro_id else "Doctor no existe"}), 404
+
+    huecos = huecos_libres([d.id for d in doctores], desde, hasta, duracion, paso)
+
+    return jsonify({
+        "desde": desde,
+        "hasta": hasta,
+        "duracion": duracion,
+        "doctores": [
+            {
+                "doctor_id": d.id,
+                "nombre": d.nombre,
+                "centro_id": d.centro_id,
+                "huecos": huecos[d.id]
+            }
+            for d in doctores
+        ]
+    }), 200
 
 
 # ======================
@@ -204,20 +542,15 @@ def listar_citas():
 
 @citas_bp.route("/<int:cita_id>", methods=["GET"])
 @jwt_required()
+@condicional("citas", "pacientes", "doctores", "centros")
 def obtener_cita(cita_id):
-    cita = Cita.query.get(cita_id)
+    cita = consulta_citas().filter(Cita.id == cita_id).first()
 
     if not cita:
         return jsonify({"error": "Cita no encontrada"}), 404
 
     return jsonify({
-        "id": cita.id,
-        "fecha": cita.fecha.isoformat(),
-        "estado": cita.estado,
-        "paciente": cita.paciente.nombre,
-        "doctor": cita.doctor.nombre,
-        "centro": cita.centro.nombre,
-        "motivo": cita.motivo,
+        **ESQUEMA_CITA.fila(cita),
         "usuario_registra": cita.id_usuario_registra
     }), 200
 
@@ -229,8 +562,7 @@ def obtener_cita(cita_id):
 @citas_bp.route("/<int:cita_id>", methods=["PUT"])
 @jwt_required()
 def cancelar_cita(cita_id):
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = identidad_actual()
 
     # Validar rol
     if user.rol not in ["admin", "secretaria"]:
@@ -244,13 +576,25 @@ def cancelar_cita(cita_id):
     if cita.estado == "CANCELADA":
         return jsonify({"error": "La cita ya está cancelada"}), 400
 
-    cita.estado = "CANCELADA"
+    # UPDATE condicional: de dos cancelaciones simultáneas solo una cambia la
+    # fila (la otra espera a su commit y ya no la encuentra sin cancelar), así
+    # que el resumen y el feed se actualizan una sola vez
+    cambiadas = (
+        Cita.query
+        .filter(Cita.id == cita_id, Cita.estado != "CANCELADA")
+        .update({Cita.estado: "CANCELADA"}, synchronize_session=False)
+    )
+    if not cambiadas:
+        db.session.rollback()
+        return jsonify({"error": "La cita ya está cancelada"}), 400
+
+    cita_cancelada(cita_id, cita.estado)
     db.session.commit()
 
     return jsonify({
         "message": "Cita cancelada correctamente",
         "cita": {
-            "id": cita.id,
-            "estado": cita.estado
+            "id": cita_id,
+            "estado": "CANCELADA"
         }
     }), 200
\ No newline at end of file
@@ -1,6 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
+from app.utils.cache import CacheTTL
+from app.utils.instrumentacion import Instrumentacion
+from app.utils.consultas_lentas import ConsultasLentas
 
 # Instancias de extensiones
 db = SQLAlchemy()
-jwt = JWTManager()
\ No newline at end of file
+jwt = JWTManager()
+
+# user_id -> token_version (utils/security.py)
+cache_usuarios = CacheTTL("CACHE_USUARIOS")
+
+# ("centro", id) / ("doctor", id) -> datos del catálogo (utils/catalogo.py)
+cache_catalogo = CacheTTL("CACHE_CATALOGO")
+
+# (informe, parámetros, versiones de tablas) -> resultado (admin/reportes.py)
+cache_reportes = CacheTTL("CACHE_REPORTES")
+
+# Server-Timing, GET /metrics y perfilador opcional (utils/instrumentacion.py)
+instrumentacion = Instrumentacion()
+
+# Sentencias SQL lentas agrupadas por huella, con su plan (utils/consultas_lentas.py)
+consultas_lentas = ConsultasLentas()
@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import case, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.extensions import db
+from app.models import AgendaDia, CambioCita, Cita, ResumenCitas, ResumenCitasMes, VersionTabla
+from app.citas.agenda import reconstruir_agendas
+from app.citas.resumen import reconstruir_resumen
+from app.utils.versiones import incrementar_versiones
+
+
+# ======================
+# Migraciones
+# ======================
+# db.create_all() solo crea las tablas que faltan: en una odontocare.db ya
+# existente no añade columnas ni índices nuevos de los modelos. Estos pasos
+# son idempotentes y se pueden ejecutar en cada arranque.
+
+
+def agregar_columnas():
+    inspector = inspect(db.engine)
+    agregadas = []
+
+    for tabla in db.metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            continue
+
+        existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+
+        for columna in tabla.columns:
+            if columna.name in existentes:
+                continue
+
+            # ADD COLUMN sin NOT NULL: las filas previas se rellenan después
+            tipo = columna.type.compile(dialect=db.engine.dialect)
+            ddl = f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"
+            if columna.server_default is not None:
+                ddl += f" DEFAULT {columna.server_default.arg}"
+
+            with db.engine.begin() as conn:
+                conn.execute(text(ddl))
+            agregadas.append(f"{tabla.name}.{columna.name}")
+
+    return agregadas
+
+
+def rellenar_fecha_fin(lote=10_000):
+    # Citas anteriores a la columna duracion: fecha_fin = fecha + duracion
+    while True:
+        filas = (
+            db.session.query(Cita.id, Cita.fecha, Cita.duracion)
+            .filter(Cita.fecha_fin.is_(None))
+            .limit(lote)
+            .all()
+        )
+        if not filas:
+            break
+
+        db.session.execute(update(Cita), [
+            {"id": f.id, "fecha_fin": f.fecha + timedelta(minutes=f.duracion)}
+            for f in filas
+        ])
+        db.session.commit()
+
+
+def rellenar_estado():
+    # Citas antiguas con estado NULL: pasan a PENDIENTE. Con NULL escapaban
+    # de "estado != 'CANCELADA'" (solapes, índice único y disponibilidad)
+    rellenadas = (
+        db.session.query(Cita)
+        .filter(Cita.estado.is_(None))
+        .update({Cita.estado: "PENDIENTE"}, synchronize_session=False)
+    )
+    if rellenadas:
+        incrementar_versiones(db.session, ["citas"])
+    db.session.commit()
+
+    if rellenadas:
+        # Agendas y resúmenes guardan el estado: se rehacen con el nuevo
+        reconstruir_agendas()
+        reconstruir_resumen()
+
+    # SQLite no admite ALTER COLUMN: allí basta con rellenar en cada arranque
+    columna = next(c for c in inspect(db.engine).get_columns("citas") if c["name"] == "estado")
+    if columna["nullable"] and db.engine.dialect.name == "postgresql":
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE citas ALTER COLUMN estado SET NOT NULL"))
+
+    return rellenadas
+
+
+def rellenar_cambios():
+    # Cambios anteriores a la copia de la cita en cambios_citas. Los ids no
+    # cambian; el estado sale del tipo (las citas se crean PENDIENTE)
+    de_la_cita = lambda columna: select(columna).where(Cita.id == CambioCita.cita_id).scalar_subquery()
+    db.session.execute(
+        update(CambioCita)
+        .where(CambioCita.estado.is_(None))
+        .values(
+            estado=case((CambioCita.tipo == "CANCELADA", "CANCELADA"), else_="PENDIENTE"),
+            paciente_id=de_la_cita(Cita.paciente_id),
+            doctor_id=de_la_cita(Cita.doctor_id),
+            centro_id=de_la_cita(Cita.centro_id)
+        )
+    )
+    db.session.commit()
+
+
+def crear_indices():
+    indices = []
+
+    for tabla in db.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            try:
+                # checkfirst: no hace nada si el índice ya existe
+                indice.create(bind=db.engine, checkfirst=True)
+                indices.append(indice.name)
+            except (IntegrityError, OperationalError) as e:
+                # Un índice único falla si hay datos duplicados previos
+                current_app.logger.warning(
+                    "No se pudo crear el índice %s: %s", indice.name, e.orig
+                )
+
+    return indices
+
+
+def sembrar_versiones():
+    # Una fila por tabla: las escrituras solo tienen que hacer UPDATE
+    existentes = {t for (t,) in db.session.query(VersionTabla.tabla)}
+    nuevas = [
+        VersionTabla(tabla=t)
+        for t in db.metadata.tables
+        if t not in existentes and t != VersionTabla.__tablename__
+    ]
+    if nuevas:
+        db.session.add_all(nuevas)
+        db.session.commit()
+
+
+def rellenar_agendas():
+    # Base con citas anteriores a agendas_dia: se materializan una vez
+    if db.session.query(AgendaDia.dia).first() is None and db.session.query(Cita.id).first():
+        reconstruir_agendas()
+
+
+def rellenar_resumen():
+    # Igual para los resúmenes de informes (diario y mensual)
+    vacios = (
+        db.session.query(ResumenCitas.dia).first() is None
+        or db.session.query(ResumenCitasMes.mes).first() is None
+    )
+    if vacios and db.session.query(Cita.id).first():
+        reconstruir_resumen()
+
+
+def aplicar_migraciones():
+    db.create_all()
+    agregar_columnas()
+    rellenar_fecha_fin()
+    sembrar_versiones()
+    rellenar_estado()
+    rellenar_cambios()
+    rellenar_agendas()
+    rellenar_resumen()
+    return crear_indices()
@@ -11,6 +11,7 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     rol = db.Column(db.String(20), nullable=False)  
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # ver en el JWT
  
 
     pacientes = db.relationship("Paciente", backref="usuario", lazy=True)
@@ -35,7 +36,8 @@ class Paciente(db.Model):
     id_usuario = db.Column(
         db.Integer,
         db.ForeignKey("users.id"),
-        nullable=True
+        nullable=True,
+        index=True
     )
 
     citas = db.relationship("Cita", backref="paciente", lazy=True)
@@ -49,7 +51,7 @@ class Centro(db.Model):
     __tablename__ = "centros"
 
     id = db.Column(db.Integer, primary_key=True)
-    nombre = db.Column(db.String(100), nullable=False)
+    nombre = db.Column(db.String(100), nullable=False, index=True)
     direccion = db.Column(db.String(200), nullable=False)
 
     doctores = db.relationship("Doctor", backref="centro", lazy=True)
@@ -69,16 +71,40 @@ class Doctor(db.Model):
     id_usuario = db.Column(
         db.Integer,
         db.ForeignKey("users.id"),
-        nullable=True
+        nullable=True,
+        index=True
     )
 
     centro_id = db.Column(
         db.Integer,
         db.ForeignKey("centros.id"),
-        nullable=False
+        nullable=False,
+        index=True
     )
 
     citas = db.relationship("Cita", backref="doctor", lazy=True)
+    horarios = db.relationship("Horario", backref="doctor", lazy=True)
+
+
+# ======================
+# Horario del Doctor
+# ======================
+# Plantilla semanal de trabajo. Un doctor sin filas usa HORARIO_POR_DEFECTO.
+
+class Horario(db.Model):
+    __tablename__ = "horarios"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dia_semana = db.Column(db.Integer, nullable=False)  # 0 = lunes ... 6 = domingo
+    hora_inicio = db.Column(db.Time, nullable=False)
+    hora_fin = db.Column(db.Time, nullable=False)
+
+    doctor_id = db.Column(
+        db.Integer,
+        db.ForeignKey("doctores.id"),
+        nullable=False,
+        index=True
+    )
 
 
 # ======================
@@ -88,10 +114,32 @@ class Doctor(db.Model):
 class Cita(db.Model):
     __tablename__ = "citas"
 
+    # Índices según los filtros reales de citas/routes.py. Todos terminan en
+    # fecha porque los listados se ordenan y paginan por (fecha, id).
+    __table_args__ = (
+        # Doble reserva: un doctor no puede tener dos citas activas a la misma
+        # hora. Parcial para que una cita cancelada no bloquee el hueco.
+        db.Index(
+            "uq_citas_doctor_fecha_activa", "doctor_id", "fecha",
+            unique=True,
+            sqlite_where=db.text("estado != 'CANCELADA'"),
+            postgresql_where=db.text("estado != 'CANCELADA'")
+        ),
+        # Vistas por rol y filtros de admin
+        db.Index("ix_citas_doctor_fecha", "doctor_id", "fecha"),
+        db.Index("ix_citas_paciente_fecha", "paciente_id", "fecha"),
+        db.Index("ix_citas_centro_fecha", "centro_id", "fecha"),
+        db.Index("ix_citas_estado_fecha", "estado", "fecha"),
+        # Listado sin filtros (admin / secretaria) y filtro por fecha
+        db.Index("ix_citas_fecha", "fecha"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    duracion = db.Column(db.Integer, nullable=False, default=30, server_default="30")  # minutos
+    fecha_fin = db.Column(db.DateTime, nullable=False)  # fecha + duracion, para buscar solapes
     motivo = db.Column(db.String(200))
-    estado = db.Column(db.String(20), default="PENDIENTE")
+    estado = db.Column(db.String(20), nullable=False, default="PENDIENTE")
 
     paciente_id = db.Column(
         db.Integer,
@@ -115,3 +163,100 @@ class Cita(db.Model):
         nullable=False
     )
 
+
+
+# ======================
+# Agenda del día (materializada)
+# ======================
+# Una fila por (centro, día, doctor) con las citas de ese día ya
+# desnormalizadas (hora, paciente, motivo, estado) en una lista JSON. La
+# mantiene citas/agenda.py al crear y cancelar citas; GET /citas/agenda la lee
+# por clave primaria sin tocar citas ni hacer JOIN.
+
+class AgendaDia(db.Model):
+    __tablename__ = "agendas_dia"
+
+    # Orden de la clave: la agenda de un centro es un rango (centro_id, dia)
+    centro_id = db.Column(db.Integer, db.ForeignKey("centros.id"), primary_key=True)
+    dia = db.Column(db.Date, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("doctores.id"), primary_key=True)
+
+    citas = db.Column(db.JSON, nullable=False)  # ordenadas por (fecha, id)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ======================
+# Resumen de citas (rollups para informes)
+# ======================
+# Número de citas y minutos reservados por (día, centro, doctor, estado) y
+# por (mes, centro, doctor, estado). Los mantiene citas/resumen.py al crear
+# y cancelar citas; los informes de /admin/reportes agrupan estas filas en
+# lugar de recorrer citas. semana (lunes) y mes (día 1) se guardan ya
+# calculados para agrupar igual en SQLite y PostgreSQL.
+
+class ResumenCitas(db.Model):
+    __tablename__ = "resumen_citas"
+
+    dia = db.Column(db.Date, primary_key=True)
+    centro_id = db.Column(db.Integer, db.ForeignKey("centros.id"), primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("doctores.id"), primary_key=True)
+    estado = db.Column(db.String(20), primary_key=True)
+
+    semana = db.Column(db.Date, nullable=False)
+    mes = db.Column(db.Date, nullable=False)
+
+    citas = db.Column(db.Integer, nullable=False, default=0)
+    minutos = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ResumenCitasMes(db.Model):
+    __tablename__ = "resumen_citas_mes"
+
+    mes = db.Column(db.Date, primary_key=True)
+    centro_id = db.Column(db.Integer, db.ForeignKey("centros.id"), primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("doctores.id"), primary_key=True)
+    estado = db.Column(db.String(20), primary_key=True)
+
+    citas = db.Column(db.Integer, nullable=False, default=0)
+    minutos = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ======================
+# Versión de cada tabla
+# ======================
+# Se incrementa al confirmar cualquier escritura en la tabla (utils/versiones.py).
+# Las lecturas calculan su ETag a partir de estas versiones.
+
+class VersionTabla(db.Model):
+    __tablename__ = "versiones_tablas"
+
+    tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ======================
+# Registro de cambios de citas
+# ======================
+# Solo se añaden filas, en la misma transacción que la cita. El id es el
+# número de secuencia del feed GET /citas/cambios (citas/eventos.py).
+
+class CambioCita(db.Model):
+    __tablename__ = "cambios_citas"
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)  # CREADA / CANCELADA
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    cita_id = db.Column(
+        db.Integer,
+        db.ForeignKey("citas.id"),
+        nullable=False
+    )
+
+    # Copia de la cita al registrar el cambio: el feed muestra el estado de
+    # ese momento y filtra por rol con estos ids, no con la cita actual
+    estado = db.Column(db.String(20), nullable=False)
+    paciente_id = db.Column(db.Integer, nullable=False)
+    doctor_id = db.Column(db.Integer, nullable=False)
+    centro_id = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,34 @@
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+# ======================
+# Ajustes del motor de base de datos
+# ======================
+# SQLite no guarda la mayoría de PRAGMAs en el fichero: hay que aplicarlos en
+# cada conexión nueva del pool. Con WAL los lectores no se bloquean detrás de
+# un escritor, y busy_timeout hace que un escritor espere al otro en lugar de
+# fallar en seguida con "database is locked".
+
+
+def _aplicar_pragmas(pragmas, conexion_dbapi, registro_conexion):
+    cursor = conexion_dbapi.cursor()
+    try:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre}={valor}")
+    finally:
+        cursor.close()
+
+
+def configurar_base_datos(app):
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name == "sqlite":
+        pragmas = app.config.get("SQLITE_PRAGMAS") or {}
+        if pragmas:
+            event.listen(
+                engine, "connect",
+                lambda conexion, registro: _aplicar_pragmas(pragmas, conexion, registro)
+            )
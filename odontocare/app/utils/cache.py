@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ======================
+# Cache LRU con caducidad (TTL)
+# ======================
+# Cache local al proceso y segura entre hilos. Se configura como el resto de
+# extensiones: se instancia en extensions.py y lee su tamaño y TTL de la
+# configuración en init_app().
+
+_NADA = object()
+
+
+class CacheTTL:
+
+    def __init__(self, prefijo_config, tamano=1024, ttl=60):
+        self.prefijo_config = prefijo_config
+        self.tamano = tamano
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.caducadas = 0
+
+    def init_app(self, app):
+        self.tamano = app.config.get(f"{self.prefijo_config}_TAMANO", self.tamano)
+        self.ttl = app.config.get(f"{self.prefijo_config}_TTL", self.ttl)
+        self.limpiar()
+
+    def get(self, clave, default=None):
+        ahora = time.monotonic()
+
+        with self._lock:
+            entrada = self._datos.get(clave, _NADA)
+
+            if entrada is not _NADA and entrada[0] <= ahora:
+                del self._datos[clave]
+                self.caducadas += 1
+                entrada = _NADA
+
+            if entrada is _NADA:
+                self.fallos += 1
+                return default
+
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def obtener(self, clave, cargar):
+        """Devuelve el valor cacheado o lo calcula con cargar(clave). None no se cachea."""
+        valor = self.get(clave, _NADA)
+        if valor is _NADA:
+            valor = cargar(clave)
+            if valor is not None:
+                self.set(clave, valor)
+        return valor
+
+    def invalidar(self, *claves):
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._datos),
+                "tamano": self.tamano,
+                "ttl": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "expulsiones": self.expulsiones,
+                "caducadas": self.caducadas,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None
+            }
@@ -0,0 +1,74 @@
+from collections import namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.extensions import db, cache_catalogo
+from app.models import Centro, Doctor
+
+
+# ======================
+# Catálogo de centros y doctores
+# ======================
+# Centros y doctores casi nunca cambian y se consultan en cada reserva, así
+# que se leen de cache_catalogo (LRU + TTL). Se guardan tuplas inmutables,
+# no objetos del ORM, para poder compartirlas entre sesiones e hilos.
+#
+# Los ids inexistentes no se cachean: un centro o doctor recién creado en
+# otro proceso se ve en la siguiente consulta.
+
+CentroCatalogo = namedtuple("CentroCatalogo", "id nombre direccion")
+DoctorCatalogo = namedtuple("DoctorCatalogo", "id nombre especialidad centro_id")
+
+
+def _cargar_centro(clave):
+    fila = (
+        db.session.query(Centro.id, Centro.nombre, Centro.direccion)
+        .filter(Centro.id == clave[1])
+        .first()
+    )
+    return CentroCatalogo(*fila) if fila else None
+
+
+def _cargar_doctor(clave):
+    fila = (
+        db.session.query(Doctor.id, Doctor.nombre, Doctor.especialidad, Doctor.centro_id)
+        .filter(Doctor.id == clave[1])
+        .first()
+    )
+    return DoctorCatalogo(*fila) if fila else None
+
+
+def obtener_centro(centro_id):
+    return cache_catalogo.obtener(("centro", centro_id), _cargar_centro)
+
+
+def obtener_doctor(doctor_id):
+    return cache_catalogo.obtener(("doctor", doctor_id), _cargar_doctor)
+
+
+# ----------------------
+# Invalidación
+# ----------------------
+# Igual que con los usuarios (utils/security.py): se invalida al confirmar.
+
+def invalidar_centros(*centro_ids):
+    _pendientes().update(("centro", c) for c in centro_ids if c is not None)
+
+
+def invalidar_doctores(*doctor_ids):
+    _pendientes().update(("doctor", d) for d in doctor_ids if d is not None)
+
+
+def _pendientes():
+    return db.session.info.setdefault("catalogo_invalidado", set())
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session):
+    pendientes = session.info.pop("catalogo_invalidado", None)
+    if pendientes:
+        cache_catalogo.invalidar(*pendientes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_invalidaciones(session):
+    session.info.pop("catalogo_invalidado", None)
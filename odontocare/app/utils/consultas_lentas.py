@@ -0,0 +1,188 @@
+import hashlib
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from time import perf_counter
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+
+# ======================
+# Registro de consultas lentas
+# ======================
+# Toda sentencia que tarda más de CONSULTAS_LENTAS_UMBRAL_MS se registra en
+# el log con la SQL, la forma de los parámetros (tipos, no valores) y la ruta
+# que la lanzó, y se agrupa por huella: la SQL normalizada sin literales, de
+# forma que "WHERE id = 3" y "WHERE id = 7" cuentan como la misma consulta.
+#
+# La primera vez que aparece una huella se guarda su plan (EXPLAIN QUERY PLAN
+# en SQLite, EXPLAIN en PostgreSQL) y se marca si recorre una tabla entera.
+# GET /admin/consultas-lentas devuelve el resumen.
+
+_LITERALES = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                # cadenas
+    (re.compile(r"%\(\w+\)s|:\w+|\$\d+|%s"), "?"),       # marcadores de parámetros
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),             # números
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?)"),  # IN (?, ?, ...)
+    (re.compile(r"\s+"), " "),
+]
+
+EXPLICABLES = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+def normalizar(sql):
+    for patron, sustituto in _LITERALES:
+        sql = patron.sub(sustituto, sql)
+    return sql.strip()
+
+
+def huella(sql_normalizada):
+    return hashlib.sha1(sql_normalizada.encode()).hexdigest()[:12]
+
+
+def forma_parametros(parametros, executemany):
+    """Tipos de los parámetros: {"fecha_1": "datetime"} o ["int", "str"]."""
+    if executemany:
+        return {"filas": len(parametros), "fila": forma_parametros(parametros[0], False) if parametros else None}
+    if isinstance(parametros, dict):
+        return {k: type(v).__name__ for k, v in parametros.items()}
+    return [type(v).__name__ for v in parametros or ()]
+
+
+def escaneo_completo(plan):
+    # SQLite: "SCAN citas" sin índice; PostgreSQL: "Seq Scan on citas"
+    return any(
+        (p.startswith("SCAN") and "INDEX" not in p) or "Seq Scan" in p
+        for p in plan
+    )
+
+
+class ConsultasLentas:
+
+    def __init__(self):
+        self.umbral = None
+        self.maximo = 500
+        self._huellas = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.umbral = app.config.get("CONSULTAS_LENTAS_UMBRAL_MS")
+        self.maximo = app.config.get("CONSULTAS_LENTAS_MAXIMO", self.maximo)
+        self.limpiar()
+        if self.umbral is None:
+            return
+
+        from app.extensions import db  # extensions.py importa este módulo
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._antes)
+            event.listen(db.engine, "after_cursor_execute", self._despues)
+
+    def limpiar(self):
+        with self._lock:
+            self._huellas.clear()
+
+    def resumen(self):
+        """Huellas ordenadas por tiempo total, de más a menos."""
+        with self._lock:
+            entradas = [dict(e, rutas=dict(e["rutas"])) for e in self._huellas.values()]
+        for e in entradas:
+            e["media_ms"] = round(e["total_ms"] / e["veces"], 2)
+            e["total_ms"] = round(e["total_ms"], 2)
+            e["max_ms"] = round(e["max_ms"], 2)
+        return sorted(entradas, key=lambda e: e["total_ms"], reverse=True)
+
+    # ----------------------
+    # Eventos del motor
+    # ----------------------
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._inicio_lenta = perf_counter()
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, "_inicio_lenta", None)
+        if inicio is None:
+            return
+        ms = (perf_counter() - inicio) * 1000
+        if ms < self.umbral:
+            return
+
+        sql = normalizar(statement)
+        clave = huella(sql)
+        ruta = request.endpoint if has_request_context() else None
+        ruta = ruta or "sin_ruta"
+
+        with self._lock:
+            entrada = self._huellas.get(clave)
+            nueva = entrada is None
+            if nueva:
+                self._hacer_sitio()
+                entrada = self._huellas[clave] = {
+                    "huella": clave,
+                    "sql": sql,
+                    "veces": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rutas": Counter(),
+                    "parametros": forma_parametros(parameters, executemany),
+                    "plan": None,
+                    "escaneo_completo": None,
+                }
+            entrada["veces"] += 1
+            entrada["total_ms"] += ms
+            entrada["max_ms"] = max(entrada["max_ms"], ms)
+            entrada["rutas"][ruta] += 1
+            entrada["ultima"] = datetime.utcnow().isoformat(timespec="seconds")
+
+        # El plan se calcula una sola vez por huella y fuera del lock
+        if nueva and not executemany and statement.lstrip().upper().startswith(EXPLICABLES):
+            plan = explicar(conn, statement, parameters)
+            with self._lock:
+                entrada["plan"] = plan
+                entrada["escaneo_completo"] = escaneo_completo(plan)
+
+        if has_app_context():
+            current_app.logger.warning(
+                "Consulta lenta %.1f ms [%s] ruta=%s parametros=%s plan=%s\n%s",
+                ms, clave, ruta, entrada["parametros"], entrada["plan"], statement
+            )
+
+    def _hacer_sitio(self):
+        # Con el máximo de huellas alcanzado se olvida la que menos ha aparecido
+        if len(self._huellas) >= self.maximo:
+            menos = min(self._huellas, key=lambda k: self._huellas[k]["veces"])
+            del self._huellas[menos]
+
+
+def explicar(conn, statement, parameters):
+    """Plan de la sentencia, lanzado con un cursor DBAPI propio para no
+    disparar de nuevo los eventos del motor."""
+    dialecto = conn.dialect.name
+    if dialecto == "sqlite":
+        prefijo, columna = "EXPLAIN QUERY PLAN ", -1   # (id, parent, notused, detail)
+    elif dialecto == "postgresql":
+        prefijo, columna = "EXPLAIN ", 0
+    else:
+        return []
+
+    # En PostgreSQL un error abortaría la transacción de la petición: el
+    # EXPLAIN va dentro de un savepoint
+    savepoint = dialecto == "postgresql"
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT explicar_consulta_lenta")
+        try:
+            cursor.execute(prefijo + statement, parameters)
+            return [str(fila[columna]) for fila in cursor.fetchall()]
+        except Exception as e:  # el plan es informativo: nunca debe romper la petición
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT explicar_consulta_lenta")
+            return [f"EXPLAIN falló: {e}"]
+        finally:
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT explicar_consulta_lenta")
+    finally:
+        cursor.close()
@@ -0,0 +1,89 @@
+import csv
+import io
+from datetime import date, datetime, time
+
+from flask import Response, current_app, request, stream_with_context
+
+from app.utils.serializacion import codificar
+
+
+# ======================
+# Exportación en streaming (NDJSON / CSV)
+# ======================
+# Las filas se leen del cursor en lotes (yield_per) y se envían según se
+# generan, así la memoria no crece con el tamaño de la tabla.
+
+TIPOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def formato_exportacion():
+    """Devuelve "ndjson", "csv" o None según ?format= o la cabecera Accept."""
+    formato = request.args.get("format")
+    if formato:
+        if formato not in TIPOS:
+            raise ValueError("format debe ser ndjson o csv")
+        return formato
+
+    mejor = request.accept_mimetypes.best_match(
+        ["application/json", *TIPOS.values()], default="application/json"
+    )
+    for nombre, tipo in TIPOS.items():
+        if mejor == tipo:
+            return nombre
+    return None
+
+
+def _lotes(query):
+    lote = current_app.config["EXPORTACION_LOTE"]
+    filas = []
+
+    for fila in query.execution_options(yield_per=lote):
+        filas.append(fila)
+        if len(filas) >= lote:
+            yield filas
+            filas = []
+
+    if filas:
+        yield filas
+
+
+def _ndjson(query, esquema):
+    for filas in _lotes(query):
+        yield b"".join(codificar(f) + b"\n" for f in esquema.filas(filas))
+
+
+def _texto(valor):
+    # Fechas en ISO 8601, igual que en JSON
+    return valor.isoformat() if isinstance(valor, (datetime, date, time)) else valor
+
+
+def _csv(query, esquema):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(esquema.campos)
+
+    for filas in _lotes(query):
+        writer.writerows(
+            [_texto(v) for v in valores] for valores in map(esquema.valores, filas)
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Cabecera si no había filas
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def respuesta_exportacion(query, formato, esquema, nombre):
+    if formato == "csv":
+        cuerpo = _csv(query, esquema)
+    else:
+        cuerpo = _ndjson(query, esquema)
+
+    respuesta = Response(stream_with_context(cuerpo), mimetype=TIPOS[formato])
+    respuesta.headers["Content-Disposition"] = f'attachment; filename="{nombre}.{formato}"'
+    return respuesta
@@ -0,0 +1,258 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+
+# ======================
+# Instrumentación por petición
+# ======================
+# Para cada petición se mide el tiempo total, las sentencias SQL (número y
+# tiempo, con eventos del motor) y el tiempo de serialización JSON. Se
+# devuelve en la cabecera Server-Timing (visible en las DevTools del
+# navegador) y se acumula por endpoint para GET /metrics (formato de texto
+# de Prometheus).
+#
+# En las respuestas en streaming (exportaciones, SSE) el tiempo medido es el
+# de preparar la respuesta, no el de enviarla entera.
+#
+# Las métricas son del proceso: con varios workers cada uno expone las suyas.
+
+SIN_RUTA = "sin_ruta"  # 404: no se usa la URL como etiqueta
+
+
+def sumar_tiempo(clave, segundos):
+    """Acumula tiempo en la petición en curso (p. ej. "serializacion")."""
+    if has_request_context() and "instrumentacion" in g:
+        g.instrumentacion[clave] += segundos
+
+
+class Metricas:
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # (endpoint, método) -> [recuentos por bucket..., +Inf], suma
+        self._histogramas = defaultdict(lambda: [[0] * (len(self.buckets) + 1), 0.0])
+        self._peticiones = Counter()   # (endpoint, método, estado)
+        self._sql = Counter()          # endpoint -> sentencias
+        self._sql_segundos = Counter() # endpoint -> segundos
+        self._serializacion = Counter()
+
+    def observar(self, endpoint, metodo, estado, segundos, datos):
+        with self._lock:
+            recuentos, _ = histograma = self._histogramas[(endpoint, metodo)]
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    recuentos[i] += 1
+                    break
+            else:
+                recuentos[-1] += 1
+            histograma[1] += segundos
+
+            self._peticiones[(endpoint, metodo, estado)] += 1
+            self._sql[endpoint] += datos["consultas"]
+            self._sql_segundos[endpoint] += datos["sql"]
+            self._serializacion[endpoint] += datos["serializacion"]
+
+    def texto(self):
+        lineas = [
+            "# HELP odontocare_peticion_segundos Latencia de las peticiones por endpoint",
+            "# TYPE odontocare_peticion_segundos histogram",
+        ]
+        with self._lock:
+            for (endpoint, metodo), (recuentos, suma) in sorted(self._histogramas.items()):
+                etiquetas = f'endpoint="{endpoint}",metodo="{metodo}"'
+                acumulado = 0
+                for limite, n in zip(self.buckets, recuentos):
+                    acumulado += n
+                    lineas.append(f'odontocare_peticion_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                acumulado += recuentos[-1]
+                lineas.append(f'odontocare_peticion_segundos_bucket{{{etiquetas},le="+Inf"}} {acumulado}')
+                lineas.append(f"odontocare_peticion_segundos_sum{{{etiquetas}}} {suma:.6f}")
+                lineas.append(f"odontocare_peticion_segundos_count{{{etiquetas}}} {acumulado}")
+
+            lineas += [
+                "# HELP odontocare_peticiones_total Peticiones por endpoint, método y código",
+                "# TYPE odontocare_peticiones_total counter",
+            ]
+            for (endpoint, metodo, estado), n in sorted(self._peticiones.items()):
+                lineas.append(
+                    f'odontocare_peticiones_total{{endpoint="{endpoint}",metodo="{metodo}",estado="{estado}"}} {n}'
+                )
+
+            for nombre, ayuda, contador, formato in (
+                ("odontocare_sql_sentencias_total", "Sentencias SQL ejecutadas", self._sql, "{}"),
+                ("odontocare_sql_segundos_total", "Tiempo en sentencias SQL", self._sql_segundos, "{:.6f}"),
+                ("odontocare_serializacion_segundos_total", "Tiempo serializando JSON", self._serializacion, "{:.6f}"),
+            ):
+                lineas += [f"# HELP {nombre} {ayuda} por endpoint", f"# TYPE {nombre} counter"]
+                for endpoint, valor in sorted(contador.items()):
+                    lineas.append(f'{nombre}{{endpoint="{endpoint}"}} {formato.format(valor)}')
+
+        return "\n".join(lineas) + "\n"
+
+
+# ----------------------
+# Perfilador por muestreo
+# ----------------------
+# Opcional (PERFILADOR_UMBRAL_MS). Un hilo toma cada PERFILADOR_INTERVALO_MS
+# la pila de los hilos que están atendiendo una petición. Si la petición
+# tarda más que el umbral, sus pilas se escriben en formato "folded"
+# (una línea "marco;marco;marco N" por pila distinta), que entienden
+# flamegraph.pl, speedscope o inferno.
+
+class Perfilador:
+
+    def __init__(self, intervalo, umbral, directorio):
+        self.intervalo = intervalo
+        self.umbral = umbral
+        self.directorio = directorio
+        self._activas = {}  # ident del hilo -> Counter de pilas
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._secuencia = itertools.count(1)  # nombres únicos dentro del mismo segundo
+
+    def empezar(self):
+        muestras = Counter()
+        with self._lock:
+            self._activas[threading.get_ident()] = muestras
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._muestrear, name="perfilador", daemon=True)
+                self._hilo.start()
+        return muestras
+
+    def terminar(self, muestras, segundos, endpoint):
+        with self._lock:
+            self._activas.pop(threading.get_ident(), None)
+
+        if segundos * 1000 < self.umbral or not muestras:
+            return None
+
+        os.makedirs(self.directorio, exist_ok=True)
+        nombre = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self._secuencia)}-"
+            f"{endpoint}-{segundos * 1000:.0f}ms.folded"
+        )
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, "w", encoding="utf-8") as f:
+            for pila, n in muestras.most_common():
+                f.write(f"{pila} {n}\n")
+        return ruta
+
+    def _muestrear(self):
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                activas = dict(self._activas)
+            if not activas:
+                continue
+
+            marcos = sys._current_frames()
+            for ident, muestras in activas.items():
+                marco = marcos.get(ident)
+                if marco is not None:
+                    muestras[_pila(marco)] += 1
+
+
+def _pila(marco):
+    pila = []
+    while marco is not None:
+        codigo = marco.f_code
+        modulo = marco.f_globals.get("__name__", "?")
+        pila.append(f"{modulo}:{codigo.co_name}")
+        marco = marco.f_back
+    return ";".join(reversed(pila))
+
+
+# ======================
+# Extensión
+# ======================
+
+class Instrumentacion:
+
+    def __init__(self):
+        self.metricas = None
+        self.perfilador = None
+
+    def init_app(self, app):
+        if not app.config.get("METRICAS_ACTIVAS", True):
+            return
+
+        self.metricas = Metricas(app.config["METRICAS_BUCKETS"])
+        self.perfilador = None
+        if app.config.get("PERFILADOR_UMBRAL_MS") is not None:
+            self.perfilador = Perfilador(
+                app.config["PERFILADOR_INTERVALO_MS"] / 1000,
+                app.config["PERFILADOR_UMBRAL_MS"],
+                app.config["PERFILADOR_DIRECTORIO"]
+            )
+
+        from app.extensions import db  # extensions.py importa este módulo
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", _antes_de_sentencia)
+            event.listen(db.engine, "after_cursor_execute", _despues_de_sentencia)
+            event.listen(db.engine, "handle_error", _error_de_sentencia)
+
+        app.before_request(self._antes)
+        app.after_request(self._despues)
+        app.teardown_request(self._fin)
+        app.add_url_rule("/metrics", "metricas", self._exponer)
+
+    def _antes(self):
+        if request.endpoint == "metricas":
+            return
+        g.instrumentacion = Counter(inicio=time.perf_counter())
+        if self.perfilador:
+            g.muestras = self.perfilador.empezar()
+
+    def _despues(self, respuesta):
+        datos = g.get("instrumentacion")
+        if datos is None:
+            return respuesta
+
+        total = time.perf_counter() - datos["inicio"]
+        endpoint = request.endpoint or SIN_RUTA
+        self.metricas.observar(endpoint, request.method, respuesta.status_code, total, datos)
+
+        respuesta.headers["Server-Timing"] = (
+            f'sql;dur={datos["sql"] * 1000:.2f};desc="{datos["consultas"]} consultas", '
+            f'ser;dur={datos["serializacion"] * 1000:.2f}, '
+            f"total;dur={total * 1000:.2f}"
+        )
+        return respuesta
+
+    def _fin(self, error=None):
+        muestras = g.pop("muestras", None)
+        if muestras is None:
+            return
+        datos = g.get("instrumentacion")
+        total = time.perf_counter() - datos["inicio"]
+        self.perfilador.terminar(muestras, total, request.endpoint or SIN_RUTA)
+
+    def _exponer(self):
+        return Response(self.metricas.texto(), mimetype="text/plain; version=0.0.4")
+
+
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_sentencia", []).append(time.perf_counter())
+
+
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    segundos = time.perf_counter() - conn.info["inicio_sentencia"].pop()
+    if has_request_context() and "instrumentacion" in g:
+        g.instrumentacion["consultas"] += 1
+        g.instrumentacion["sql"] += segundos
+
+
+def _error_de_sentencia(contexto):
+    # La sentencia falló: after_cursor_execute no llega a ejecutarse
+    if contexto.connection is not None:
+        inicios = contexto.connection.info.get("inicio_sentencia")
+        if inicios:
+            inicios.pop()
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+from app.extensions import db
+
+
+# ======================
+# Paginación por cursor (keyset)
+# ======================
+# En lugar de OFFSET, cada página continúa desde la clave de ordenación de la
+# última fila devuelta, así que pedir la página 1000 cuesta lo mismo que la 1.
+
+
+def leer_parametros_pagina():
+    """Devuelve (limite, cursor) de la query string. Lanza ValueError si son inválidos."""
+    maximo = current_app.config["PAGINA_LIMITE_MAXIMO"]
+    limite = request.args.get("limit", current_app.config["PAGINA_LIMITE_DEFECTO"])
+
+    try:
+        limite = int(limite)
+    except (TypeError, ValueError):
+        raise ValueError("limit debe ser un número entero")
+
+    if limite < 1:
+        raise ValueError("limit debe ser mayor que 0")
+
+    return min(limite, maximo), request.args.get("cursor")
+
+
+def codificar_cursor(valores):
+    valores = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    texto = json.dumps(valores, separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode()).decode()
+
+
+def decodificar_cursor(cursor, columnas):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(valores) != len(columnas):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if isinstance(c.type, db.DateTime) else int(v)
+            for c, v in zip(columnas, valores)
+        ]
+    except (ValueError, TypeError):
+        raise ValueError("cursor inválido")
+
+
+def paginar(query, columnas, limite, cursor=None):
+    """Ordena por `columnas` y continúa después del cursor. Pide una fila extra
+    para saber si existe página siguiente."""
+    if cursor:
+        valores = decodificar_cursor(cursor, columnas)
+
+        # (a, b) > (x, y)  ->  a > x OR (a = x AND b > y)
+        condiciones = []
+        for i, columna in enumerate(columnas):
+            iguales = [columnas[j] == valores[j] for j in range(i)]
+            condiciones.append(and_(*iguales, columna > valores[i]))
+        query = query.filter(or_(*condiciones))
+
+    return query.order_by(*columnas).limit(limite + 1)
+
+
+def pagina(filas, limite, claves):
+    """Recorta las filas al límite y calcula next_cursor a partir de `claves`
+    (nombres de atributo de la fila en el mismo orden que las columnas)."""
+    siguiente = None
+
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor([getattr(ultima, k) for k in claves])
+
+    return filas, siguiente
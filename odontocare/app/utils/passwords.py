@@ -0,0 +1,74 @@
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# ======================
+# Hash de contraseñas
+# ======================
+# Algoritmo y coste salen de Config (PASSWORD_HASH_METODO, con el formato de
+# Werkzeug: "scrypt:n:r:p" o "pbkdf2:sha256:iteraciones"). Los hashes con otro
+# método se actualizan solos en el siguiente login correcto.
+
+_pool = None
+
+
+def metodo_configurado():
+    return current_app.config["PASSWORD_HASH_METODO"]
+
+
+@lru_cache(maxsize=None)
+def _metodo_normalizado(metodo):
+    # "scrypt" -> "scrypt:32768:8:1": el prefijo que Werkzeug guarda en el hash
+    return generate_password_hash("x", method=metodo).split("$", 1)[0]
+
+
+def hashear_password(password, metodo=None):
+    return generate_password_hash(password, method=metodo or metodo_configurado())
+
+
+def necesita_rehash(password_hash, metodo=None):
+    return password_hash.split("$", 1)[0] != _metodo_normalizado(metodo or metodo_configurado())
+
+
+def verificar_password(user, password):
+    """Comprueba la contraseña y, si el hash usa otro método, lo regenera.
+    El llamador debe confirmar la sesión."""
+    if not check_password_hash(user.password_hash, password):
+        return False
+
+    if necesita_rehash(user.password_hash):
+        user.password_hash = hashear_password(password)
+
+    return True
+
+
+# ----------------------
+# Hash por lotes (importaciones)
+# ----------------------
+
+def _obtener_pool(procesos):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=procesos)
+        atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def hashear_lote(passwords):
+    """Hashea una lista de contraseñas repartiéndola en un pool de procesos."""
+    metodo = metodo_configurado()
+    procesos = current_app.config["PASSWORD_HASH_PROCESOS"] or os.cpu_count() or 1
+
+    # Para pocos elementos no compensa enviar el trabajo a otros procesos
+    if procesos <= 1 or len(passwords) < current_app.config["PASSWORD_HASH_LOTE_MINIMO"]:
+        return [hashear_password(p, metodo) for p in passwords]
+
+    trozo = max(1, len(passwords) // (procesos * 4))
+    return list(_obtener_pool(procesos).map(
+        partial(generate_password_hash, method=metodo), passwords, chunksize=trozo
+    ))
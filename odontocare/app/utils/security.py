@@ -1,17 +1,131 @@
+from collections import namedtuple
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from app.models import User
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.extensions import db, jwt, cache_usuarios
+from app.models import User, Paciente, Doctor
 
 
+# ======================
+# Identidad en el token
+# ======================
+# El login guarda en el JWT el rol y el paciente/doctor asociado, así las
+# rutas autorizan sin consultar users/pacientes/doctores en cada petición.
+# "ver" es la versión de tokens del usuario: al subirla (revocar_tokens) los
+# tokens emitidos antes dejan de valer. Como todo cambio de asociación sube
+# la versión, los claims de un token con la versión vigente son válidos.
+#
+# La comprobación de versión usa cache_usuarios (LRU + TTL), de modo que una
+# petición normal no hace ninguna consulta para autenticarse.
+
+Identidad = namedtuple("Identidad", "user_id username rol paciente_id doctor_id")
+
+
+def claims_usuario(user):
+    # Una sola consulta: paciente/doctor asociado
+    paciente_id, doctor_id = (
+        db.session.query(Paciente.id, Doctor.id)
+        .select_from(User)
+        .outerjoin(Paciente, Paciente.id_usuario == User.id)
+        .outerjoin(Doctor, Doctor.id_usuario == User.id)
+        .filter(User.id == user.id)
+        .first()
+    )
+
+    return {
+        "username": user.username,
+        "rol": user.rol,
+        "paciente_id": paciente_id,
+        "doctor_id": doctor_id,
+        "ver": user.token_version
+    }
+
+
+def identidad_actual():
+    claims = get_jwt()
+    return Identidad(
+        int(claims["sub"]),
+        claims["username"],
+        claims["rol"],
+        claims["paciente_id"],
+        claims["doctor_id"]
+    )
+
+
+def cargar_version(user_id):
+    return db.session.query(User.token_version).filter(User.id == user_id).scalar()
+
+
+# ----------------------
+# Invalidación
+# ----------------------
+# Las claves se invalidan al confirmar la transacción: si se hiciera antes,
+# otra petición podría volver a cachear los datos viejos hasta el commit.
+
+def invalidar_usuarios(*user_ids):
+    pendientes = db.session.info.setdefault("usuarios_invalidados", set())
+    pendientes.update(u for u in user_ids if u is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session):
+    pendientes = session.info.pop("usuarios_invalidados", None)
+    if pendientes:
+        cache_usuarios.invalidar(*pendientes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_invalidaciones(session):
+    session.info.pop("usuarios_invalidados", None)
+
+
+def revocar_tokens(*user_ids):
+    # Se confirma junto con el resto de cambios de la petición
+    ids = [u for u in user_ids if u is not None]
+    if ids:
+        User.query.filter(User.id.in_(ids)).update(
+            {User.token_version: User.token_version + 1},
+            synchronize_session=False
+        )
+        invalidar_usuarios(*ids)
+
+
+@jwt.token_in_blocklist_loader
+def token_revocado(jwt_header, jwt_payload):
+    # Tokens sin versión (emitidos antes de los claims) también se rechazan
+    if "ver" not in jwt_payload:
+        return True
+
+    user_id = int(jwt_payload["sub"])
+    version = cache_usuarios.obtener(user_id, cargar_version)
+
+    # Un token más nuevo que la cache viene de un login o una revocación
+    # hecha en otro proceso: se relee antes de rechazarlo
+    if version is not None and jwt_payload["ver"] > version:
+        version = cargar_version(user_id)
+        if version is not None:
+            cache_usuarios.set(user_id, version)
+
+    return version is None or version != jwt_payload["ver"]
+
+
+@jwt.revoked_token_loader
+def respuesta_token_revocado(jwt_header, jwt_payload):
+    return jsonify({"error": "Token revocado, vuelve a iniciar sesión"}), 401
+
+
+# ======================
+# Decoradores de rol
+# ======================
+
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
 
-        if not user or user.rol != "admin":
+        if identidad_actual().rol != "admin":
             return jsonify({"error": "Acceso solo para administradores"}), 403
 
         return fn(*args, **kwargs)
@@ -23,13 +137,10 @@ def roles_required(*roles):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = int(get_jwt_identity())
-            user = User.query.get(user_id)
 
-            if not user or user.rol not in roles:
+            if identidad_actual().rol not in roles:
                 return jsonify({"error": "No autorizado"}), 403
 
             return fn(*args, **kwargs)
         return wrapper
     return decorator
-
@@ -0,0 +1,139 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+from time import perf_counter
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+from app.utils.instrumentacion import sumar_tiempo
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa el json de la biblioteca estándar
+    orjson = None
+
+
+# ======================
+# Esquemas de filas
+# ======================
+# Un esquema declara qué campos se serializan de una fila. Acepta filas de
+# SQLAlchemy (Row), namedtuples del catálogo u objetos del ORM. Las fechas se
+# dejan tal cual: las convierte a ISO 8601 el codificador JSON.
+#
+# Leer una Row por atributo es varias veces más lento que por posición, así
+# que para filas con _fields se calcula una vez qué posiciones tomar.
+
+class Esquema:
+
+    def __init__(self, *campos):
+        if len(campos) < 2:
+            raise ValueError("Un esquema necesita al menos dos campos")
+        self.campos = list(campos)
+        self._por_atributo = attrgetter(*campos)
+        self._por_posicion = {}  # _fields de la fila -> itemgetter
+
+    def valores(self, fila):
+        """Tupla con los valores de los campos del esquema."""
+        return self._extractor(fila)(fila)
+
+    def fila(self, fila):
+        return dict(zip(self.campos, self.valores(fila)))
+
+    def filas(self, filas):
+        if not filas:
+            return []
+        inicio = perf_counter()
+        campos, valores = self.campos, self._extractor(filas[0])
+        resultado = [dict(zip(campos, valores(f))) for f in filas]
+        sumar_tiempo("serializacion", perf_counter() - inicio)
+        return resultado
+
+    def _extractor(self, fila):
+        campos_fila = getattr(fila, "_fields", None)
+        if campos_fila is None:
+            return self._por_atributo
+
+        extractor = self._por_posicion.get(campos_fila)
+        if extractor is None:
+            extractor = itemgetter(*[campos_fila.index(c) for c in self.campos])
+            self._por_posicion[campos_fila] = extractor
+        return extractor
+
+
+# Columnas de consulta_citas() (citas/routes.py): paciente, doctor y centro
+# son los nombres unidos por JOIN
+ESQUEMA_CITA = Esquema("id", "fecha", "duracion", "estado", "motivo", "paciente", "doctor", "centro")
+ESQUEMA_PACIENTE = Esquema("id", "nombre", "telefono", "estado", "id_usuario")
+ESQUEMA_DOCTOR = Esquema("id", "nombre", "especialidad", "centro_id")
+ESQUEMA_CENTRO = Esquema("id", "nombre", "direccion")
+
+
+# ======================
+# Codificador JSON
+# ======================
+# JSON_CODIFICADOR = "orjson", "json" o "auto" (orjson si está instalado).
+# Los dos escriben las fechas como isoformat() y devuelven bytes UTF-8.
+
+def _por_defecto(valor):
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+
+def _orjson(obj):
+    return orjson.dumps(obj, default=_por_defecto)
+
+
+def _json(obj):
+    return json.dumps(
+        obj, default=_por_defecto, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def elegir_codificador(nombre):
+    if nombre == "auto":
+        nombre = "orjson" if orjson else "json"
+    if nombre == "orjson":
+        if not orjson:
+            raise RuntimeError("JSON_CODIFICADOR=orjson pero orjson no está instalado")
+        return _orjson
+    if nombre == "json":
+        return _json
+    raise ValueError(f"JSON_CODIFICADOR desconocido: {nombre}")
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    """jsonify() y request.get_json() con el codificador configurado."""
+
+    sort_keys = False  # se respeta el orden declarado en los esquemas
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.codificar = elegir_codificador(app.config.get("JSON_CODIFICADOR", "auto"))
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault("default", _por_defecto)
+            return json.dumps(obj, **kwargs)
+        return self.codificar(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        inicio = perf_counter()
+        cuerpo = self.codificar(obj) + b"\n"
+        sumar_tiempo("serializacion", perf_counter() - inicio)
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
+
+
+def codificar(obj):
+    """bytes JSON con el codificador de la aplicación (streams NDJSON / SSE)."""
+    return current_app.json.codificar(obj)
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+
+# ======================
+# Validación de parámetros
+# ======================
+# SQLite aceptaba comparar un id "1" con un entero o una fecha con zona horaria
+# con una columna sin zona. PostgreSQL no, así que las entradas se convierten
+# al tipo de la columna antes de llegar a la consulta.
+
+
+def parsear_id(valor, nombre):
+    """Entero positivo desde JSON o query string. Lanza ValueError si no lo es."""
+    if isinstance(valor, bool):
+        raise ValueError(f"{nombre} debe ser numérico")
+
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{nombre} debe ser numérico")
+
+    if valor < 1:
+        raise ValueError(f"{nombre} debe ser numérico")
+    return valor
+
+
+def parsear_fecha(texto):
+    """ISO 8601 -> datetime sin zona horaria. Lanza ValueError si no es válida.
+
+    Las columnas DateTime guardan la hora local de la clínica: si llega una
+    zona horaria se descarta y se conserva la hora indicada, como hacía SQLite."""
+    if not isinstance(texto, str):
+        raise ValueError("fecha debe ser un texto ISO 8601")
+
+    fecha = datetime.fromisoformat(texto)
+    return fecha.replace(tzinfo=None) if fecha.tzinfo else fecha
@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.http import is_resource_modified
+from app.extensions import db
+from app.models import VersionTabla
+from app.utils.security import identidad_actual
+
+
+# ======================
+# Versiones de tablas
+# ======================
+# Las rutas que escriben marcan las tablas que modifican y la versión se
+# incrementa justo antes del commit, en la misma transacción que los datos.
+# Se hace al final para que la fila de versión (compartida por todas las
+# escrituras de la tabla) quede bloqueada el menor tiempo posible.
+
+def marcar_cambios(*tablas):
+    db.session.info.setdefault("tablas_modificadas", set()).update(tablas)
+
+
+@event.listens_for(Session, "before_commit")
+def _incrementar_marcadas(session):
+    tablas = session.info.pop("tablas_modificadas", None)
+    if tablas:
+        incrementar_versiones(session, tablas)
+
+
+def incrementar_versiones(session, tablas):
+    # También se puede llamar antes del commit para bloquear ya la fila
+    # (ver citas/eventos.py)
+    ahora = datetime.utcnow()
+
+    # Orden fijo: dos commits concurrentes bloquean las filas en el mismo orden
+    for tabla in sorted(tablas):
+        if _incrementar(session, tabla, ahora):
+            continue
+
+        # Primera escritura de la tabla en una base sin sembrar
+        try:
+            with session.begin_nested():
+                session.add(VersionTabla(tabla=tabla, version=1, actualizado=ahora))
+        except IntegrityError:
+            # Otra transacción la ha creado a la vez
+            _incrementar(session, tabla, ahora)
+
+
+def _incrementar(session, tabla, ahora):
+    resultado = session.execute(
+        update(VersionTabla)
+        .where(VersionTabla.tabla == tabla)
+        .values(version=VersionTabla.version + 1, actualizado=ahora)
+    )
+    return resultado.rowcount > 0
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_cambios(session):
+    session.info.pop("tablas_modificadas", None)
+
+
+def leer_versiones(tablas):
+    filas = (
+        db.session.query(VersionTabla.tabla, VersionTabla.version, VersionTabla.actualizado)
+        .filter(VersionTabla.tabla.in_(tablas))
+        .all()
+    )
+    return {f.tabla: (f.version, f.actualizado) for f in filas}
+
+
+# ======================
+# Peticiones condicionales
+# ======================
+# El ETag depende de las versiones de las tablas que lee la ruta, de la URL
+# con sus filtros, del formato pedido y del usuario (cada rol ve filas
+# distintas). Si el cliente ya lo tiene se responde 304 sin ejecutar la ruta.
+#
+# Las versiones se leen antes que los datos: si entre medias se confirma una
+# escritura, la respuesta lleva datos nuevos con el ETag viejo y el siguiente
+# sondeo la vuelve a descargar. Nunca al revés.
+
+def calcular_etag(versiones, tablas):
+    user = identidad_actual()
+    clave = "|".join([
+        request.full_path,
+        request.headers.get("Accept", ""),
+        f"{user.user_id}:{user.rol}:{user.paciente_id}:{user.doctor_id}",
+        ",".join(f"{t}={versiones.get(t, (0, None))[0]}" for t in tablas)
+    ])
+    return hashlib.sha1(clave.encode()).hexdigest()
+
+
+def condicional(*tablas):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            versiones = leer_versiones(tablas)
+            etag = calcular_etag(versiones, tablas)
+            fechas = [actualizado for _, actualizado in versiones.values()]
+            ultima = max(fechas) if fechas else None
+
+            # Solo cuenta el ETag: If-Modified-Since no distingue usuario ni
+            # filtros y tiene resolución de segundos (304 con datos viejos)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=None):
+                respuesta = make_response("", 304)
+            else:
+                respuesta = make_response(fn(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+
+            respuesta.set_etag(etag)
+            if ultima:
+                respuesta.last_modified = ultima
+            respuesta.cache_control.private = True
+            respuesta.cache_control.no_cache = True
+            respuesta.vary.update(["Authorization", "Accept"])
+            return respuesta
+        return wrapper
+    return decorator
@@ -0,0 +1,366 @@
+"""Benchmark de carga de la API completa.
+
+Siembra una base de datos del tamaño indicado (centros, doctores, pacientes y
+citas), arranca la app en un servidor HTTP real con hilos y la somete a carga
+desde un generador local con conexiones keep-alive. Cada escenario lanza N
+peticiones con C clientes concurrentes y mide:
+
+  - latencia p50/p95/p99 (ms, vista desde el cliente)
+  - peticiones por segundo
+  - consultas SQL por petición (cabecera Server-Timing de la app)
+  - respuestas con un código distinto del esperado
+
+Escenarios: login, listado de citas por rol, agenda del día, crear_cita,
+cancelar_cita y el CRUD de admin (pacientes y centros).
+
+Los resultados se pueden guardar como JSON y compararse con una línea base:
+una regresión de latencia p95 por encima de la tolerancia, media consulta o
+más por petición o errores nuevos hacen que el script termine con código 1.
+
+Uso (desde la carpeta odontocare):
+    python -m benchmarks.bench_carga --citas 1000000 --guardar benchmarks/base.json
+    python -m benchmarks.bench_carga --citas 1000000 --comparar benchmarks/base.json
+
+Con DATABASE_URL se usa esa base de datos (debe estar vacía) en lugar de una
+SQLite temporal.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.extensions import db
+from app.migraciones import aplicar_migraciones
+from app.models import User, Cita
+from app.utils.security import claims_usuario
+from config import Config
+from benchmarks.sembrar import sembrar, config_temporal, fecha_hueco, PASSWORD
+
+TOKENS_POR_ROL = 200  # usuarios distintos por rol en los escenarios de listado
+CONSULTAS = re.compile(r'desc="(\d+) consultas"')  # Server-Timing (utils/instrumentacion.py)
+
+
+# ======================
+# Servidor
+# ======================
+
+def arrancar_servidor(app):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+# ======================
+# Preparación
+# ======================
+
+def config_carga():
+    return Config if os.environ.get("DATABASE_URL") else config_temporal()
+
+
+def token_de(user):
+    return create_access_token(identity=str(user.id), additional_claims=claims_usuario(user))
+
+
+def preparar(args):
+    app = create_app(config_carga())
+
+    with app.app_context():
+        aplicar_migraciones()
+        inicio = time.perf_counter()
+        sembrar(
+            centros=args.centros, doctores=args.doctores,
+            pacientes=args.pacientes, citas=args.citas,
+            progreso=lambda n, total: print(f"\r  sembrando citas {n}/{total}", end="", flush=True)
+        )
+        print(f"\nsemilla lista en {time.perf_counter() - inicio:.1f} s")
+
+        rnd = random.Random(7)
+        tokens = {"admin": [token_de(db.session.get(User, 1))],
+                  "secretaria": [token_de(db.session.get(User, 2))]}
+
+        # Usuarios de doctores: ids 3..3+doctores; de pacientes a continuación
+        for rol, primero, total in (("medico", 3, args.doctores),
+                                    ("paciente", 3 + args.doctores, args.pacientes)):
+            ids = rnd.sample(range(primero, primero + total), min(total, TOKENS_POR_ROL))
+            tokens[rol] = [token_de(db.session.get(User, i)) for i in ids]
+
+        # Citas que se cancelarán (una vez cada una)
+        pendientes = [i for (i,) in (
+            db.session.query(Cita.id)
+            .filter(Cita.estado == "PENDIENTE")
+            .order_by(Cita.id)
+            .limit(args.peticiones)
+        )]
+
+    return app, tokens, pendientes
+
+
+# ======================
+# Escenarios
+# ======================
+# Cada escenario es (códigos esperados, generar, tras, disponibles):
+#   - generar: i -> (método, ruta, cuerpo, token)
+#   - tras: recibe el cuerpo de cada respuesta correcta (p. ej. para borrar
+#     después los pacientes creados)
+#   - disponibles: máximo de peticiones cuando consumen datos de un solo uso
+
+def escenarios(args, tokens, pendientes):
+    rnd = random.Random(11)
+    admin = tokens["admin"][0]
+    secretaria = tokens["secretaria"][0]
+    sufijo = int(time.time())
+    primer_hueco = args.citas // args.doctores + 1
+    huecos_ocupados = args.citas // args.doctores
+    creados = []
+
+    def centro_de(doctor_id):
+        return (doctor_id - 1) % args.centros + 1
+
+    def crear_cita(i):
+        # Huecos posteriores a los sembrados, uno distinto por petición
+        doctor_id = i % args.doctores + 1
+        return "POST", "/citas/", {
+            "paciente_id": rnd.randint(1, args.pacientes),
+            "doctor_id": doctor_id,
+            "centro_id": centro_de(doctor_id),
+            "fecha": fecha_hueco(primer_hueco + i // args.doctores).isoformat(),
+            "motivo": "Revisión"
+        }, admin
+
+    def eliminar_paciente(i):
+        return "DELETE", f"/admin/pacientes/{creados.pop()}", None, admin
+
+    return {
+        "auth.login": ({200}, lambda i: ("POST", "/auth/login", {
+            "username": f"paciente{rnd.randint(1, args.pacientes)}" if i % 2
+                        else f"doctor{rnd.randint(1, args.doctores)}",
+            "password": PASSWORD
+        }, None), None, None),
+
+        "citas.listar admin": ({200}, lambda i: (
+            "GET", f"/citas/?limit=50&centro_id={rnd.randint(1, args.centros)}", None, admin
+        ), None, None),
+        "citas.listar secretaria": ({200}, lambda i: (
+            "GET", f"/citas/?limit=50&fecha={fecha_hueco(rnd.randrange(huecos_ocupados)).isoformat()}",
+            None, secretaria
+        ), None, None),
+        "citas.listar medico": ({200}, lambda i: (
+            "GET", "/citas/?limit=50", None, rnd.choice(tokens["medico"])
+        ), None, None),
+        "citas.listar paciente": ({200}, lambda i: (
+            "GET", "/citas/?limit=50", None, rnd.choice(tokens["paciente"])
+        ), None, None),
+
+        "citas.agenda centro": ({200}, lambda i: (
+            "GET", f"/citas/agenda?dia={fecha_hueco(rnd.randrange(huecos_ocupados)).date()}"
+                   f"&centro_id={rnd.randint(1, args.centros)}", None, secretaria
+        ), None, None),
+        "citas.agenda medico": ({200}, lambda i: (
+            "GET", f"/citas/agenda?dia={fecha_hueco(rnd.randrange(huecos_ocupados)).date()}",
+            None, rnd.choice(tokens["medico"])
+        ), None, None),
+
+        "citas.crear_cita": ({201}, crear_cita, None, None),
+        "citas.cancelar_cita": ({200}, lambda i: (
+            "PUT", f"/citas/{pendientes[i]}", None, admin
+        ), None, lambda: len(pendientes)),
+
+        "admin.crear_centro": ({201}, lambda i: ("POST", "/admin/centros", {
+            "nombre": f"Centro carga {sufijo}-{i}", "direccion": "Calle"
+        }, admin), None, None),
+        "admin.obtener_centro": ({200}, lambda i: (
+            "GET", f"/admin/centros/{rnd.randint(1, args.centros)}", None, admin
+        ), None, None),
+        "admin.crear_paciente": ({201}, lambda i: ("POST", "/admin/pacientes", {
+            "nombre": f"Paciente carga {i}", "username": f"carga{sufijo}_{i}", "password": PASSWORD
+        }, admin), lambda cuerpo: creados.append(cuerpo["paciente"]["id"]), None),
+        "admin.listar_pacientes": ({200}, lambda i: (
+            "GET", "/admin/pacientes?limit=50", None, admin
+        ), None, None),
+        "admin.obtener_paciente": ({200}, lambda i: (
+            "GET", f"/admin/pacientes/{rnd.randint(1, args.pacientes)}", None, admin
+        ), None, None),
+        "admin.actualizar_paciente": ({200}, lambda i: (
+            "PUT", f"/admin/pacientes/{rnd.randint(1, args.pacientes)}", {"telefono": f"6{i:08d}"}, admin
+        ), None, None),
+        "admin.eliminar_paciente": ({200}, eliminar_paciente, None, lambda: len(creados)),
+    }
+
+
+# ======================
+# Generador de carga
+# ======================
+
+def ejecutar(puerto, generar, esperados, tras, peticiones, concurrencia):
+    contador = itertools.count()
+    lock = threading.Lock()
+    muestras = []  # (ms, consultas, correcta)
+
+    def trabajador():
+        conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+        locales = []
+
+        while True:
+            with lock:
+                i = next(contador)
+                if i >= peticiones:
+                    break
+                metodo, ruta, cuerpo, token = generar(i)
+
+            cabeceras = {"Content-Type": "application/json"}
+            if token:
+                cabeceras["Authorization"] = f"Bearer {token}"
+            datos = json.dumps(cuerpo) if cuerpo is not None else None
+
+            inicio = time.perf_counter()
+            try:
+                conexion.request(metodo, ruta, body=datos, headers=cabeceras)
+                r = conexion.getresponse()
+                contenido = r.read()
+            except (http.client.HTTPException, OSError):
+                # El servidor cerró la conexión: se cuenta como error y se reabre
+                conexion.close()
+                conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+                locales.append(((time.perf_counter() - inicio) * 1000, 0, False))
+                continue
+            ms = (time.perf_counter() - inicio) * 1000
+
+            correcta = r.status in esperados
+            if correcta and tras:
+                with lock:
+                    tras(json.loads(contenido))
+            consultas = CONSULTAS.search(r.getheader("Server-Timing", ""))
+            locales.append((ms, int(consultas.group(1)) if consultas else 0, correcta))
+
+        conexion.close()
+        with lock:
+            muestras.extend(locales)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=trabajador) for _ in range(concurrencia)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+
+    return resumen(muestras, duracion)
+
+
+def resumen(muestras, duracion):
+    latencias = sorted(m[0] for m in muestras)
+    percentiles = statistics.quantiles(latencias, n=100, method="inclusive") if len(latencias) > 1 else latencias * 99
+    return {
+        "peticiones": len(muestras),
+        "errores": sum(1 for m in muestras if not m[2]),
+        "rps": round(len(muestras) / duracion, 1),
+        "p50_ms": round(percentiles[49], 2),
+        "p95_ms": round(percentiles[94], 2),
+        "p99_ms": round(percentiles[98], 2),
+        "consultas": round(statistics.mean(m[1] for m in muestras), 2),
+    }
+
+
+# ======================
+# Informe y línea base
+# ======================
+
+def informe(resultados):
+    print(f"\n{'escenario':28s} {'req/s':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'SQL/req':>8s} {'errores':>8s}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:28s} {r['rps']:8.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+              f"{r['p99_ms']:8.2f} {r['consultas']:8.2f} {r['errores']:8d}")
+
+
+def comparar(resultados, base, tolerancia):
+    """Lista de regresiones respecto a la línea base."""
+    regresiones = []
+    for nombre, r in resultados.items():
+        anterior = base.get(nombre)
+        if not anterior:
+            continue
+        if r["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']} -> {r['p95_ms']} ms")
+        # Media por petición: los fallos de cache de usuarios añaden décimas
+        if r["consultas"] >= anterior["consultas"] + 0.5:
+            regresiones.append(f"{nombre}: consultas/petición {anterior['consultas']} -> {r['consultas']}")
+        if r["errores"] > anterior["errores"]:
+            regresiones.append(f"{nombre}: errores {anterior['errores']} -> {r['errores']}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--centros", type=int, default=10)
+    parser.add_argument("--doctores", type=int, default=100)
+    parser.add_argument("--pacientes", type=int, default=10_000)
+    parser.add_argument("--citas", type=int, default=1_000_000)
+    parser.add_argument("--peticiones", type=int, default=500, help="peticiones por escenario")
+    parser.add_argument("--concurrencia", type=int, default=8, help="clientes simultáneos")
+    parser.add_argument("--escenarios", help="solo los que contengan este texto (p. ej. citas.)")
+    parser.add_argument("--guardar", help="fichero JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="línea base JSON con la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="margen de p95 (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    app, tokens, pendientes = preparar(args)
+    servidor = arrancar_servidor(app)
+    print(f"servidor en http://127.0.0.1:{servidor.port} "
+          f"({args.peticiones} peticiones por escenario, {args.concurrencia} clientes)")
+
+    resultados = {}
+    try:
+        for nombre, (esperados, generar, tras, disponibles) in escenarios(args, tokens, pendientes).items():
+            if args.escenarios and args.escenarios not in nombre:
+                continue
+            peticiones = min(args.peticiones, disponibles()) if disponibles else args.peticiones
+            if peticiones <= 0:
+                continue
+            resultados[nombre] = ejecutar(servidor.port, generar, esperados, tras, peticiones, args.concurrencia)
+            print(f"  {nombre} listo")
+    finally:
+        servidor.shutdown()
+
+    informe(resultados)
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump({
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "base_datos": app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+                "parametros": {k: v for k, v in vars(args).items() if k not in ("guardar", "comparar")},
+                "resultados": resultados
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nresultados guardados en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)["resultados"]
+        regresiones = comparar(resultados, base, args.tolerancia)
+        if regresiones:
+            print("\nREGRESIONES respecto a " + args.comparar)
+            for r in regresiones:
+                print("  " + r)
+            sys.exit(1)
+        print(f"\nsin regresiones respecto a {args.comparar}")
+
+
+if __name__ == "__main__":
+    main()
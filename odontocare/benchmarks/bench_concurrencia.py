@@ -0,0 +1,133 @@
+"""Benchmark de concurrencia sobre SQLite.
+
+Lanza N hilos que mezclan lecturas (GET /citas) y reservas (POST /citas)
+contra la app real, primero con SQLite sin ajustes (journal por defecto,
+sin PRAGMAs) y después con SQLITE_PRAGMAS de config.py. Muestra peticiones
+por segundo y cuántas fallaron con "database is locked".
+
+Uso (desde la carpeta odontocare):
+    python -m benchmarks.bench_concurrencia --hilos 16 --segundos 10
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+
+from flask import got_request_exception
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.migraciones import aplicar_migraciones
+from app.models import User
+from app.utils.security import claims_usuario
+from benchmarks.sembrar import sembrar, config_temporal, fecha_hueco
+
+CENTROS = 10
+
+
+def preparar(config, doctores, citas):
+    app = create_app(config)
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+
+    with app.app_context():
+        aplicar_migraciones()
+        sembrar(centros=CENTROS, doctores=doctores, pacientes=1000, citas=citas)
+        admin = User.query.get(1)
+        token = create_access_token(identity=str(admin.id), additional_claims=claims_usuario(admin))
+
+    return app, token
+
+
+def ejecutar(app, token, hilos, segundos, proporcion_reservas, doctores, primer_hueco):
+    resultados = Counter()
+    bloqueos = Counter()
+    lock = threading.Lock()
+
+    def registrar_excepcion(sender, exception, **extra):
+        if "database is locked" in str(exception):
+            with lock:
+                bloqueos["locked"] += 1
+
+    got_request_exception.connect(registrar_excepcion, app)
+
+    cabeceras = {"Authorization": f"Bearer {token}"}
+    fin = time.perf_counter() + segundos
+
+    def trabajador(semilla):
+        rnd = random.Random(semilla)
+        cliente = app.test_client()
+        locales = Counter()
+
+        while time.perf_counter() < fin:
+            if rnd.random() < proporcion_reservas:
+                # Huecos futuros al azar: algunos chocarán (409), es lo esperado
+                doctor_id = rnd.randint(1, doctores)
+                r = cliente.post("/citas/", headers=cabeceras, json={
+                    "paciente_id": rnd.randint(1, 1000),
+                    "doctor_id": doctor_id,
+                    "centro_id": (doctor_id - 1) % CENTROS + 1,
+                    "fecha": fecha_hueco(primer_hueco + rnd.randint(0, 2000)).isoformat()
+                })
+                tipo = "reserva"
+            else:
+                r = cliente.get(f"/citas/?doctor_id={rnd.randint(1, doctores)}&limit=50", headers=cabeceras)
+                tipo = "lectura"
+            locales[(tipo, r.status_code)] += 1
+
+        with lock:
+            resultados.update(locales)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracion = time.perf_counter() - inicio
+
+    got_request_exception.disconnect(registrar_excepcion, app)
+    return resultados, bloqueos["locked"], duracion
+
+
+def informe(titulo, resultados, bloqueados, duracion):
+    total = sum(resultados.values())
+    errores = sum(n for (tipo, estado), n in resultados.items() if estado >= 500)
+    print(f"\n===== {titulo} =====")
+    print(f"peticiones: {total}  ({total / duracion:.1f} req/s)")
+    for (tipo, estado), n in sorted(resultados.items()):
+        print(f"  {tipo:8s} {estado}: {n}")
+    print(f"errores 5xx: {errores} ({errores * 100 / max(total, 1):.2f}%), "
+          f"'database is locked': {bloqueados} ({bloqueados * 100 / max(total, 1):.2f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--reservas", type=float, default=0.3, help="proporción de reservas")
+    parser.add_argument("--doctores", type=int, default=50)
+    parser.add_argument("--citas", type=int, default=50_000)
+    args = parser.parse_args()
+
+    primer_hueco = args.citas // args.doctores + 1
+
+    escenarios = [
+        # "Antes": configuración original, sin PRAGMAs ni opciones de pool
+        ("SQLite sin ajustes", config_temporal(
+            SQLITE_PRAGMAS={},
+            SQLALCHEMY_ENGINE_OPTIONS={}
+        )),
+        ("SQLite con SQLITE_PRAGMAS", config_temporal()),
+    ]
+
+    for titulo, config in escenarios:
+        app, token = preparar(config, args.doctores, args.citas)
+        resultados, bloqueados, duracion = ejecutar(
+            app, token, args.hilos, args.segundos, args.reservas, args.doctores, primer_hueco
+        )
+        informe(titulo, resultados, bloqueados, duracion)
+
+
+if __name__ == "__main__":
+    main()
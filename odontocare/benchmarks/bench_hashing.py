@@ -0,0 +1,74 @@
+"""Benchmark de hash de contraseñas.
+
+Para cada método (formato Werkzeug) mide cuánto tarda check_password_hash en
+un núcleo, es decir, los logins por segundo que puede atender cada núcleo, y
+el rendimiento de hashear_lote (pool de procesos) frente a hacerlo en serie.
+
+Uso (desde la carpeta odontocare):
+    python -m benchmarks.bench_hashing
+    python -m benchmarks.bench_hashing --metodos scrypt:16384:8:1 pbkdf2:sha256:600000
+"""
+import argparse
+import os
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app import create_app
+from app.utils.passwords import hashear_lote
+from benchmarks.sembrar import config_temporal
+
+METODOS = [
+    "scrypt:32768:8:1",
+    "scrypt:16384:8:1",
+    "pbkdf2:sha256:1000000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:100000",
+]
+
+
+def logins_por_segundo(metodo, segundos):
+    password_hash = generate_password_hash("1234", method=metodo)
+    n = 0
+    inicio = time.perf_counter()
+
+    while time.perf_counter() - inicio < segundos:
+        check_password_hash(password_hash, "1234")
+        n += 1
+
+    duracion = time.perf_counter() - inicio
+    return n / duracion, duracion / n * 1000
+
+
+def hashes_por_segundo(app, metodo, cantidad, procesos):
+    app.config.update(PASSWORD_HASH_METODO=metodo, PASSWORD_HASH_PROCESOS=procesos)
+    passwords = [f"password{i}" for i in range(cantidad)]
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        hashear_lote(passwords)
+        return cantidad / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--metodos", nargs="+", default=METODOS)
+    parser.add_argument("--segundos", type=float, default=2.0, help="duración de cada medición de login")
+    parser.add_argument("--lote", type=int, default=200, help="contraseñas por medición de hashear_lote")
+    args = parser.parse_args()
+
+    app = create_app(config_temporal())
+    nucleos = os.cpu_count() or 1
+
+    print(f"{'método':24s} {'ms/login':>9s} {'logins/s/núcleo':>16s} "
+          f"{'lote serie/s':>13s} {'lote pool/s':>12s} ({nucleos} procesos)")
+
+    for metodo in args.metodos:
+        por_segundo, ms = logins_por_segundo(metodo, args.segundos)
+        serie = hashes_por_segundo(app, metodo, args.lote, 1)
+        pool = hashes_por_segundo(app, metodo, args.lote, nucleos)
+        print(f"{metodo:24s} {ms:9.1f} {por_segundo:16.1f} {serie:13.1f} {pool:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark de índices de citas.
+
+Siembra N citas (1M por defecto) en una SQLite temporal y muestra, para las
+consultas reales de listado y reserva, el plan (EXPLAIN QUERY PLAN) y el
+tiempo medio sin índices y con los índices de models.py.
+
+Uso (desde la carpeta odontocare):
+    python -m benchmarks.bench_indices --citas 1000000
+"""
+import argparse
+import statistics
+import time
+from datetime import timedelta
+
+from sqlalchemy import event, text
+
+from app import create_app
+from app.extensions import db
+from app.migraciones import crear_indices
+from app.models import Cita, Paciente, Doctor
+from app.citas.routes import consulta_citas
+from app.citas.reservas import condicion_solape
+from app.utils.paginacion import paginar
+from benchmarks.sembrar import sembrar, config_temporal, fecha_hueco, MINUTOS_HUECO
+
+
+def escenarios(doctores, pacientes, citas):
+    fecha_media = fecha_hueco(citas // doctores // 2)
+    dia = fecha_media.replace(hour=0, minute=0)
+    pagina = lambda q: paginar(q, [Cita.fecha, Cita.id], 50)
+
+    return {
+        "listado admin (sin filtros)": pagina(consulta_citas()),
+        "listado admin centro_id": pagina(consulta_citas().filter(Cita.centro_id == 3)),
+        "listado admin estado": pagina(consulta_citas().filter(Cita.estado == "CANCELADA")),
+        "listado secretaria fecha": pagina(consulta_citas().filter(Cita.fecha == fecha_media)),
+        "listado medico": pagina(consulta_citas().filter(Cita.doctor_id == doctores // 2)),
+        "listado paciente": pagina(consulta_citas().filter(Cita.paciente_id == pacientes // 2)),
+        "agenda centro (dia)": pagina(consulta_citas().filter(
+            Cita.centro_id == 3, Cita.fecha >= dia, Cita.fecha < dia + timedelta(days=1)
+        )),
+        "agenda medico (semana)": pagina(consulta_citas().filter(
+            Cita.doctor_id == doctores // 2, Cita.fecha >= dia, Cita.fecha < dia + timedelta(days=7)
+        )),
+        "listado secretaria dia": pagina(consulta_citas().filter(
+            Cita.fecha >= dia, Cita.fecha < dia + timedelta(days=1)
+        )),
+        "reserva: solape": Cita.query.filter(condicion_solape(
+            doctores // 2, fecha_media, fecha_media + timedelta(minutes=MINUTOS_HUECO)
+        )).limit(1),
+        "token: Paciente por id_usuario": Paciente.query.filter_by(id_usuario=3 + doctores + pacientes // 2).limit(1),
+        "token: Doctor por id_usuario": Doctor.query.filter_by(id_usuario=3 + doctores // 2).limit(1),
+    }
+
+
+def plan(query):
+    """Ejecuta la consulta capturando la SQL real y devuelve su plan."""
+    capturada = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        capturada.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capturar)
+    try:
+        query.all()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capturar)
+
+    sql, params = capturada[0]
+    filas = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)
+    return [f[-1] for f in filas]
+
+
+def medir(query, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        query.all()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def informe(titulo, consultas, repeticiones):
+    print(f"\n===== {titulo} =====")
+    for nombre, query in consultas.items():
+        pasos = plan(query)
+        ms = medir(query, repeticiones)
+        escaneo = any(p.startswith("SCAN") and "INDEX" not in p for p in pasos)
+        print(f"{nombre:32s} {ms:9.2f} ms  {'FULL SCAN' if escaneo else 'índice'}")
+        for paso in pasos:
+            print(f"    {paso}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--citas", type=int, default=1_000_000)
+    parser.add_argument("--doctores", type=int, default=100)
+    parser.add_argument("--pacientes", type=int, default=10_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app(config_temporal())
+
+    with app.app_context():
+        db.create_all()
+
+        # Se siembra sin índices (inserción más rápida) para medir el "antes"
+        for tabla in db.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.drop(bind=db.engine, checkfirst=True)
+
+        inicio = time.perf_counter()
+        sembrar(doctores=args.doctores, pacientes=args.pacientes, citas=args.citas,
+                progreso=lambda n, total: print(f"\rsembrando {n}/{total}", end="", flush=True))
+        print(f"\n{args.citas} citas sembradas en {time.perf_counter() - inicio:.1f} s")
+
+        consultas = escenarios(args.doctores, args.pacientes, args.citas)
+        informe("SIN ÍNDICES", consultas, args.repeticiones)
+
+        inicio = time.perf_counter()
+        crear_indices()
+        db.session.execute(text("ANALYZE"))
+        print(f"\níndices creados en {time.perf_counter() - inicio:.1f} s")
+
+        informe("CON ÍNDICES", consultas, args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark de los informes de /admin/reportes.
+
+Siembra 5 años de citas (20 doctores, unas 730.000 citas) en una SQLite
+temporal y mide cada informe de tres formas: agrupando directamente la tabla
+citas (lo que costaría sin resumen), sobre resumen_citas con la cache vacía
+y con la cache caliente. Los dos últimos son peticiones HTTP completas
+(test client, con autenticación y serialización).
+
+Uso (desde la carpeta odontocare):
+    python -m benchmarks.bench_reportes --anios 5
+
+Con DATABASE_URL se usa esa base de datos (debe estar vacía) en lugar de una
+SQLite temporal.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from sqlalchemy import func
+
+from config import Config
+from app import create_app
+from app.extensions import db, cache_reportes
+from app.models import Cita, ResumenCitas
+from benchmarks.sembrar import sembrar, config_temporal, fecha_hueco, PASSWORD, HUECOS_POR_DIA
+
+
+def config_reportes():
+    # Sin registro de consultas lentas: la siembra lo dispararía en cada lote
+    if os.environ.get("DATABASE_URL"):
+        return type("ConfigBenchmark", (Config,), {"CONSULTAS_LENTAS_UMBRAL_MS": None})
+    return config_temporal(CONSULTAS_LENTAS_UMBRAL_MS=None)
+
+
+def escenarios(desde, hasta):
+    rango = f"desde={desde}&hasta={hasta}"
+    return {
+        "citas por día": f"/admin/reportes/citas?{rango}",
+        "citas por mes, doctor y estado": f"/admin/reportes/citas?{rango}&periodo=mes&por=doctor,estado",
+        "citas por semana de un centro": f"/admin/reportes/citas?{rango}&periodo=semana&centro_id=3",
+        "cancelaciones por centro": f"/admin/reportes/cancelaciones?{rango}",
+        "cancelaciones por centro y mes": f"/admin/reportes/cancelaciones?{rango}&periodo=mes",
+        "ocupación por doctor": f"/admin/reportes/ocupacion?{rango}",
+        "ocupación por doctor y mes": f"/admin/reportes/ocupacion?{rango}&periodo=mes",
+    }
+
+
+def medir(funcion, repeticiones, antes=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def agrupar_citas():
+    """El informe más pequeño (totales por centro) calculado sobre citas."""
+    return (
+        db.session.query(Cita.centro_id, Cita.estado, func.count(Cita.id), func.sum(Cita.duracion))
+        .group_by(Cita.centro_id, Cita.estado)
+        .all()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--anios", type=int, default=5)
+    parser.add_argument("--doctores", type=int, default=20)
+    parser.add_argument("--pacientes", type=int, default=10_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    dias = 365 * args.anios
+    citas = dias * HUECOS_POR_DIA * args.doctores
+    desde = fecha_hueco(0).date()
+    hasta = fecha_hueco(citas // args.doctores - 1).date()
+
+    app = create_app(config_reportes())
+    cliente = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+
+        inicio = time.perf_counter()
+        sembrar(centros=5, doctores=args.doctores, pacientes=args.pacientes, citas=citas,
+                progreso=lambda n, total: print(f"\rsembrando {n}/{total}", end="", flush=True))
+        filas = db.session.query(func.count()).select_from(ResumenCitas).scalar()
+        print(f"\n{citas} citas ({desde} a {hasta}) -> {filas} filas de resumen "
+              f"en {time.perf_counter() - inicio:.1f} s")
+
+        ms = medir(agrupar_citas, args.repeticiones)
+        print(f"\nGROUP BY sobre citas (totales por centro y estado): {ms:.1f} ms")
+
+    r = cliente.post("/auth/login", json={"username": "admin", "password": PASSWORD})
+    cabeceras = {"Authorization": "Bearer " + r.get_json()["access_token"]}
+
+    def pedir(url):
+        r = cliente.get(url, headers=cabeceras)
+        assert r.status_code == 200, (url, r.status_code, r.get_json())
+        return r
+
+    print(f"\n{'informe':34s} {'items':>7s} {'sin cache':>11s} {'con cache':>11s}")
+    for nombre, url in escenarios(desde, hasta).items():
+        items = len(pedir(url).get_json()["items"])
+        frio = medir(lambda: pedir(url), args.repeticiones, antes=cache_reportes.limpiar)
+        caliente = medir(lambda: pedir(url), args.repeticiones)
+        print(f"{nombre:34s} {items:7d} {frio:8.1f} ms {caliente:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
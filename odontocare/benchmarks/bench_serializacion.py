@@ -0,0 +1,109 @@
+"""Benchmark de serialización JSON de listados.
+
+Con N citas (10k por defecto) ya leídas de la base de datos compara el coste
+de convertirlas en la respuesta JSON:
+
+  - dict + jsonify: diccionario hecho a mano con isoformat() y el proveedor
+    JSON por defecto de Flask (lo que hacían las rutas antes)
+  - esquema + json / esquema + orjson: ESQUEMA_CITA y ProveedorJSON con cada
+    codificador
+
+y después mide GET /citas?limit=N completo con cada codificador.
+
+Uso (desde la carpeta odontocare):
+    python -m benchmarks.bench_serializacion --citas 10000
+"""
+import argparse
+import statistics
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.extensions import db
+from app.models import User
+from app.citas.routes import consulta_citas
+from app.utils.security import claims_usuario
+from app.utils.serializacion import ESQUEMA_CITA, ProveedorJSON, orjson
+from benchmarks.sembrar import sembrar, config_temporal
+
+
+def serializar_a_mano(c):
+    return {
+        "id": c.id,
+        "fecha": c.fecha.isoformat(),
+        "duracion": c.duracion,
+        "estado": c.estado,
+        "motivo": c.motivo,
+        "paciente": c.paciente,
+        "doctor": c.doctor,
+        "centro": c.centro
+    }
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--citas", type=int, default=10_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(config_temporal(PAGINA_LIMITE_MAXIMO=args.citas))
+    codificadores = ["json"] + (["orjson"] if orjson else [])
+
+    with app.app_context():
+        db.create_all()
+        sembrar(pacientes=1000, citas=args.citas)
+        filas = consulta_citas().order_by("fecha", "id").all()
+
+        flask_por_defecto = DefaultJSONProvider(app)
+        proveedores = {}
+        for nombre in codificadores:
+            app.config["JSON_CODIFICADOR"] = nombre
+            proveedores[nombre] = ProveedorJSON(app)
+
+        casos = {
+            "dict + jsonify (antes)": lambda: flask_por_defecto.response(
+                {"items": [serializar_a_mano(c) for c in filas], "next_cursor": None}
+            ),
+        }
+        for nombre, proveedor in proveedores.items():
+            casos[f"esquema + {nombre}"] = lambda p=proveedor: p.response(
+                {"items": ESQUEMA_CITA.filas(filas), "next_cursor": None}
+            )
+
+        print(f"\n===== Serialización de {len(filas)} citas (mediana de {args.repeticiones}) =====")
+        base = None
+        with app.test_request_context():
+            for nombre, funcion in casos.items():
+                ms = medir(funcion, args.repeticiones)
+                base = base or ms
+                print(f"{nombre:28s} {ms:9.2f} ms  x{base / ms:.1f}")
+
+        token = create_access_token(
+            identity="1", additional_claims=claims_usuario(db.session.get(User, 1))
+        )
+
+    print(f"\n===== GET /citas?limit={args.citas} completo =====")
+    cliente = app.test_client()
+    cabeceras = {"Authorization": f"Bearer {token}"}
+    for nombre, proveedor in proveedores.items():
+        app.json = proveedor
+        ms = medir(
+            lambda: cliente.get(f"/citas/?limit={args.citas}", headers=cabeceras),
+            args.repeticiones
+        )
+        print(f"{'esquema + ' + nombre:28s} {ms:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
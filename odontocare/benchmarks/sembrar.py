@@ -0,0 +1,126 @@
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+
+from config import Config
+from app.extensions import db
+from app.models import User, Paciente, Centro, Doctor, Cita
+from app.citas.agenda import reconstruir_agendas
+from app.citas.resumen import reconstruir_resumen
+
+
+# ======================
+# Datos sintéticos para benchmarks
+# ======================
+# Todos los usuarios comparten la password "1234" (se hashea una sola vez).
+
+PASSWORD = "1234"
+FECHA_BASE = datetime(2020, 1, 6, 9, 0)
+HUECOS_POR_DIA = 20          # 09:00 - 19:00 cada 30 minutos
+MINUTOS_HUECO = 30
+
+
+def config_temporal(ruta=None, **extra):
+    """Config con una base de datos SQLite desechable."""
+    ruta = ruta or os.path.join(tempfile.mkdtemp(prefix="odontocare-bench-"), "bench.db")
+    atributos = {"SQLALCHEMY_DATABASE_URI": "sqlite:///" + ruta, **extra}
+    return type("ConfigBenchmark", (Config,), atributos)
+
+
+def fecha_hueco(k):
+    """Fecha del hueco k-ésimo de un doctor (sin repetir nunca)."""
+    dia, hueco = divmod(k, HUECOS_POR_DIA)
+    return FECHA_BASE + timedelta(days=dia, minutes=MINUTOS_HUECO * hueco)
+
+
+def _insertar(modelo, filas):
+    if filas:
+        db.session.execute(insert(modelo), filas)
+
+
+def _ajustar_secuencias(modelos):
+    # En PostgreSQL los ids explícitos no avanzan la secuencia del SERIAL:
+    # sin esto el siguiente INSERT de la API chocaría con id = 1
+    if db.engine.dialect.name != "postgresql":
+        return
+    for modelo in modelos:
+        tabla = modelo.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {tabla}))"
+        ))
+
+
+def sembrar(centros=10, doctores=100, pacientes=10_000, citas=1_000_000,
+            lote=50_000, semilla=42, progreso=None):
+    rnd = random.Random(semilla)
+    password_hash = generate_password_hash(PASSWORD)
+
+    # Usuarios: 1 admin, 1 secretaria, uno por doctor y uno por paciente
+    _insertar(User, [
+        {"id": 1, "username": "admin", "password_hash": password_hash, "rol": "admin"},
+        {"id": 2, "username": "secretaria", "password_hash": password_hash, "rol": "secretaria"},
+    ])
+    _insertar(User, [
+        {"id": 3 + d, "username": f"doctor{d + 1}", "password_hash": password_hash, "rol": "medico"}
+        for d in range(doctores)
+    ])
+    primer_paciente = 3 + doctores
+    _insertar(User, [
+        {"id": primer_paciente + p, "username": f"paciente{p + 1}",
+         "password_hash": password_hash, "rol": "paciente"}
+        for p in range(pacientes)
+    ])
+
+    _insertar(Centro, [
+        {"id": c + 1, "nombre": f"Centro {c + 1}", "direccion": f"Calle {c + 1}"}
+        for c in range(centros)
+    ])
+    _insertar(Doctor, [
+        {"id": d + 1, "nombre": f"Doctor {d + 1}", "especialidad": "Odontología",
+         "centro_id": d % centros + 1, "id_usuario": 3 + d}
+        for d in range(doctores)
+    ])
+    _insertar(Paciente, [
+        {"id": p + 1, "nombre": f"Paciente {p + 1}", "telefono": "600000000",
+         "estado": "ACTIVO", "id_usuario": primer_paciente + p}
+        for p in range(pacientes)
+    ])
+    _ajustar_secuencias([User, Centro, Doctor, Paciente])
+    db.session.commit()
+
+    # Citas repartidas entre doctores en huecos consecutivos: nunca se solapan
+    filas = []
+    for i in range(citas):
+        doctor = i % doctores
+        fecha = fecha_hueco(i // doctores)
+        filas.append({
+            "fecha": fecha,
+            "duracion": MINUTOS_HUECO,
+            "fecha_fin": fecha + timedelta(minutes=MINUTOS_HUECO),
+            "motivo": "Revisión",
+            "estado": "CANCELADA" if rnd.random() < 0.1 else "PENDIENTE",
+            "paciente_id": rnd.randint(1, pacientes),
+            "doctor_id": doctor + 1,
+            "centro_id": doctor % centros + 1,
+            "id_usuario_registra": 1,
+        })
+
+        if len(filas) >= lote:
+            _insertar(Cita, filas)
+            db.session.commit()
+            filas = []
+            if progreso:
+                progreso(i + 1, citas)
+
+    _insertar(Cita, filas)
+    db.session.commit()
+
+    # Las citas se insertan sin pasar por la API: agendas_dia y resumen_citas
+    # se calculan al final
+    reconstruir_agendas()
+    reconstruir_resumen()
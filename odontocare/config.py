@@ -2,8 +2,125 @@ import os
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+
+def url_base_datos():
+    # DATABASE_URL permite usar otro motor (p. ej. postgresql+psycopg://...)
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        return "sqlite:///" + os.path.join(BASE_DIR, "odontocare.db")
+
+    # Formato antiguo de algunos proveedores
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def opciones_motor(url):
+    # SQLite en memoria usa un pool de una sola conexión sin estas opciones
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return {}
+
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),  # segundos
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
+
+
 class Config:
     SECRET_KEY = "clave_secreta"
     JWT_SECRET_KEY = "jwt_clave_super_secreta"
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "odontocare.db")
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = url_base_datos()
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool de conexiones (se puede ajustar por entorno)
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_motor(SQLALCHEMY_DATABASE_URI)
+
+    # PRAGMAs aplicados a cada conexión SQLite (app/utils/base_datos.py)
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),  # ms
+        "cache_size": -64000,  # KiB (64 MB)
+        "mmap_size": 268435456,  # 256 MB
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    }
+
+    # Hash de contraseñas (formato Werkzeug). Los hashes antiguos se
+    # regeneran con este método en el siguiente login.
+    PASSWORD_HASH_METODO = os.environ.get("PASSWORD_HASH_METODO", "scrypt:32768:8:1")
+    PASSWORD_HASH_PROCESOS = None  # procesos para importaciones (None = nº de CPUs)
+    PASSWORD_HASH_LOTE_MINIMO = 32  # por debajo se hashea en el propio proceso
+
+    # Cache de usuarios autenticados (rol, paciente/doctor y versión del token)
+    CACHE_USUARIOS_TAMANO = 10_000
+    CACHE_USUARIOS_TTL = 60  # segundos
+
+    # Cache de centros y doctores (casi estáticos)
+    CACHE_CATALOGO_TAMANO = 5_000
+    CACHE_CATALOGO_TTL = 300  # segundos
+
+    # Cache de informes (GET /admin/reportes). La clave lleva la versión de
+    # los datos: el TTL solo libera informes que ya no se piden
+    CACHE_REPORTES_TAMANO = 500
+    CACHE_REPORTES_TTL = 600  # segundos
+
+    # Duración de las citas en minutos
+    CITA_DURACION_DEFECTO = 30
+    CITA_DURACION_MAXIMA = 240
+
+    # Horario semanal de los doctores sin plantilla propia
+    # {dia_semana (0 = lunes): [(hora_inicio, hora_fin), ...]}
+    HORARIO_POR_DEFECTO = {
+        dia: [("09:00", "14:00"), ("16:00", "20:00")] for dia in range(5)
+    }
+
+    # Máximo de días por búsqueda en GET /citas/disponibilidad
+    DISPONIBILIDAD_DIAS_MAXIMO = 62
+
+    # Máximo de días entre desde y hasta en GET /admin/reportes (unos 10 años)
+    REPORTES_DIAS_MAXIMO = 3660
+
+    # Importación masiva (POST /admin/import)
+    IMPORTACION_LOTE = 500
+    IMPORTACION_MAX_ERRORES = 1000
+
+    # Paginación de listados (GET /citas, GET /admin/pacientes)
+    PAGINA_LIMITE_DEFECTO = 50
+    PAGINA_LIMITE_MAXIMO = 500
+
+    # Filas por lote en las exportaciones NDJSON/CSV
+    EXPORTACION_LOTE = 1000
+
+    # Codificador JSON de las respuestas: auto (orjson si está instalado), orjson o json
+    JSON_CODIFICADOR = os.environ.get("JSON_CODIFICADOR", "auto")
+
+    # Feed de cambios de citas (GET /citas/cambios)
+    CAMBIOS_LOTE = 500            # eventos máximos por respuesta
+    CAMBIOS_ESPERA_MAXIMA = 30    # segundos de long-poll
+    CAMBIOS_INTERVALO = 1         # segundos entre consultas mientras se espera
+    CAMBIOS_SSE_DURACION = 300    # segundos antes de cerrar un stream SSE
+    CAMBIOS_LATIDO = 15           # segundos entre comentarios de keep-alive SSE
+
+    # Instrumentación (app/utils/instrumentacion.py): cabecera Server-Timing
+    # y métricas de Prometheus en GET /metrics
+    METRICAS_ACTIVAS = os.environ.get("METRICAS_ACTIVAS", "1") == "1"
+    METRICAS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # segundos
+
+    # Perfilador por muestreo: guarda las pilas (formato folded, para
+    # flamegraphs) de las peticiones más lentas que el umbral. None = apagado
+    PERFILADOR_UMBRAL_MS = (
+        int(os.environ["PERFILADOR_UMBRAL_MS"]) if os.environ.get("PERFILADOR_UMBRAL_MS") else None
+    )
+    PERFILADOR_INTERVALO_MS = 5
+    PERFILADOR_DIRECTORIO = os.path.join(BASE_DIR, "perfiles")
+
+    # Registro de consultas lentas (GET /admin/consultas-lentas). None = apagado
+    CONSULTAS_LENTAS_UMBRAL_MS = (
+        None if os.environ.get("CONSULTAS_LENTAS_UMBRAL_MS") == ""
+        else float(os.environ.get("CONSULTAS_LENTAS_UMBRAL_MS", 100))
+    )
+    CONSULTAS_LENTAS_MAXIMO = 500  # huellas distintas que se conservan
@@ -1,10 +1,11 @@
 from app import create_app
-from app.extensions import db
+from app.migraciones import aplicar_migraciones
 
 app = create_app()
 
-with app.app_context(): #si la bdd ya existe no la vuelve a crear
-    db.create_all()
-
 if __name__ == "__main__":
+    # En producción las migraciones se aplican aparte: flask --app run init-db
+    with app.app_context(): #si la bdd ya existe no la vuelve a crear, solo añade lo que falte
+        aplicar_migraciones()
+
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from config import Config
+from app import create_app
+from app.extensions import db, cache_usuarios, cache_catalogo, cache_reportes
+from benchmarks.sembrar import sembrar, config_temporal
+
+
+# ======================
+# Fixtures comunes
+# ======================
+# Cada test recibe una app con su propia SQLite temporal sembrada con los
+# datos sintéticos de benchmarks/sembrar.py (password "1234" para todos).
+# Con DATABASE_URL se usa esa base de datos (p. ej. el PostgreSQL de
+# docker-compose): se vacía y se vuelve a sembrar en cada app.
+# Las caches de app/extensions.py son globales del proceso: se vacían al
+# crear cada app para que no se cuelen datos de otra base de datos.
+
+def config_tests():
+    # Sin registro de consultas lentas: su EXPLAIN no debe contar
+    if os.environ.get("DATABASE_URL"):
+        return type("ConfigTests", (Config,), {"CONSULTAS_LENTAS_UMBRAL_MS": None})
+    return config_temporal(CONSULTAS_LENTAS_UMBRAL_MS=None)
+
+
+def limpiar_caches():
+    for cache in (cache_usuarios, cache_catalogo, cache_reportes):
+        cache.limpiar()
+
+
+@pytest.fixture
+def crear_app():
+    """Fábrica: crear_app(citas=N) devuelve una app con N citas sembradas."""
+    def crear(**sembrado):
+        limpiar_caches()
+        app = create_app(config_tests())
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            sembrar(**sembrado)
+        limpiar_caches()
+        return app
+
+    return crear
@@ -0,0 +1,42 @@
+import pytest
+
+from tests.utilidades import ContadorSQL, token
+
+
+# ======================
+# GET /citas: número de consultas constante
+# ======================
+# El listado lee pacientes, doctores y centros con JOIN en una sola consulta
+# (consulta_citas). Si vuelve la carga perezosa por fila (una consulta por
+# cita para su paciente, doctor o centro), el número de sentencias crece con
+# las citas y este test falla.
+
+USUARIOS = ["admin", "secretaria", "doctor1", "paciente1"]
+
+
+def consultas_listado(app, username):
+    cliente = app.test_client()
+    cabeceras = {"Authorization": "Bearer " + token(cliente, username)}
+
+    # Primera petición: calienta las caches de usuarios y catálogo
+    r = cliente.get("/citas/?limit=500", headers=cabeceras)
+    assert r.status_code == 200, r.get_json()
+
+    with ContadorSQL(app) as contador:
+        r = cliente.get("/citas/?limit=500", headers=cabeceras)
+    assert r.status_code == 200, r.get_json()
+    return contador.total, len(r.get_json()["items"])
+
+
+@pytest.mark.parametrize("username", USUARIOS)
+def test_listado_citas_no_depende_del_numero_de_filas(crear_app, username):
+    sembrado = {"centros": 2, "doctores": 4, "pacientes": 5}
+    # Cada app se mide justo después de crearla, con las caches vacías
+    consultas_pocas, filas_pocas = consultas_listado(crear_app(citas=8, **sembrado), username)
+    consultas_muchas, filas_muchas = consultas_listado(crear_app(citas=400, **sembrado), username)
+
+    assert filas_muchas > filas_pocas
+    assert consultas_muchas == consultas_pocas, (
+        f"{username}: {consultas_pocas} consultas con {filas_pocas} citas y "
+        f"{consultas_muchas} con {filas_muchas}"
+    )
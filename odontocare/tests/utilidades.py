@@ -0,0 +1,38 @@
+from sqlalchemy import event
+
+from app.extensions import db
+from benchmarks.sembrar import PASSWORD
+
+
+# ======================
+# Utilidades de los tests
+# ======================
+
+def token(cliente, username):
+    r = cliente.post("/auth/login", json={"username": username, "password": PASSWORD})
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()["access_token"]
+
+
+class ContadorSQL:
+    """Cuenta las sentencias SQL que se ejecutan dentro del bloque with."""
+
+    def __init__(self, app):
+        self.app = app
+        self.sentencias = []
+
+    def _contar(self, conn, cursor, statement, parameters, context, executemany):
+        self.sentencias.append(statement)
+
+    def __enter__(self):
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *error):
+        with self.app.app_context():
+            event.remove(db.engine, "before_cursor_execute", self._contar)
+
+    @property
+    def total(self):
+        return len(self.sentencias)